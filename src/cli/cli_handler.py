@@ -1,7 +1,9 @@
 import sys
 import os
+import time
 from colorama import Fore, Style, init
 import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Add the project root to sys.path dynamically
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -9,11 +11,14 @@ sys.path.append(project_root)
 
 # cli args
 import argparse
-from src.modules.xml_parser import XMLParser
+from src.modules.xml_parser import XMLParser, DEFAULT_CHUNK_SIZE
 from src.modules.xml_formatter import XMLFormatter
 from src.modules.xml_to_json import XMLToJSONConverter
 from src.modules.xml_minifier import XMLMinifier
-from src.modules.xml_compressor import XMLCompressor
+from src.modules.xml_compressor import XMLCompressor, TAGS
+from src.modules.xml_blocks import BLOCK_SIZE
+from src.modules.xml_dictionary import DICTIONARY_SIZE
+from src.modules import xml_codecs
 from src.modules.xml_decompressor import XMLDecompressor
 from src.graph.graph_representation import GraphRepresentation
 from src.graph.network_analysis import NetworkAnalysis
@@ -30,6 +35,13 @@ def add_extension(file_path, extension):
         return f"{file_path}{extension}"
     return file_path
 
+# Argument type for counts that must be at least 1
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
 # Default output file function
 def get_default_output(input_file, operation):
     # Determine default extension based on operation
@@ -49,21 +61,35 @@ def get_default_output(input_file, operation):
 
 ###### CLI commands (XML operations) ############################################################
 
-def verify_xml(input_file, fix=False, output_file=None):
+def verify_xml(input_file, fix=False, output_file=None, stream=False, chunk_size=DEFAULT_CHUNK_SIZE, jobs=1,
+               max_errors=None, count_only=False):
     print(f"{Style.BRIGHT}{Fore.CYAN}Verifying XML file: {input_file}{Style.RESET_ALL}")
 
     base_filename = os.path.splitext(input_file)[0]  # Get the base filename without extension
     if not output_file:
         output_file = f"{base_filename}_fixed.xml"
 
-    parser = XMLParser(input_file)  # Pass the input file to the XMLParser instance
+    parser = XMLParser(input_file, stream=stream, chunk_size=chunk_size, workers=jobs)  # Pass the input file to the XMLParser instance
     try:
+        # Only report how many errors there are per tag
+        if count_only:
+            counts = parser.count_errors(max_errors)
+            if not counts:
+                print(f"{Fore.GREEN}XML is valid.")
+                return True
+            print(f"{Fore.RED}XML is invalid. Errors found: {sum(counts.values())}")
+            for (missing, tag), count in counts.most_common():
+                print(f"  {Fore.YELLOW}Missing {missing} tag for {tag}: {count}")
+            return False
+
         # First check for consistency
-        error_count = parser.check_consistency()  # Returns number of errors found
+        error_count = parser.check_consistency(max_errors)  # Returns number of errors found
         if error_count == 0:
             print(f"{Fore.GREEN}XML is valid.")
         else:
             print(f"{Fore.RED}XML is invalid. Errors found: {error_count}")
+            if max_errors is not None and error_count >= max_errors:
+                print(f"{Fore.YELLOW}Stopped after the first {max_errors} errors.")
             for error_item in parser.errors:
                 line = error_item[0]  # Line number where the error occurred
                 error_message = error_item[1]  # The error message
@@ -75,7 +101,7 @@ def verify_xml(input_file, fix=False, output_file=None):
 
             # If the --fix flag is set, fix errors
             if fix:
-                parser.fix_errors()  # Fix the errors
+                parser.fix_errors(output_file)  # Fix the errors
                 output_file = output_file or get_default_output(input_file, "verify")
                 print(f"{Fore.GREEN}Errors fixed and saved to {output_file}")
             else:
@@ -89,15 +115,64 @@ def verify_xml(input_file, fix=False, output_file=None):
     return True  # Return True if no errors found or errors were fixed
 
 
+def _verify_file(input_file, stream, chunk_size, max_errors):
+    # Runs in a worker process: verify one file and return a short summary
+    size = os.path.getsize(input_file)
+    try:
+        error_count = XMLParser(input_file, stream=stream, chunk_size=chunk_size).check_consistency(max_errors)
+    except Exception as e:
+        return input_file, size, None, str(e)
+    return input_file, size, error_count, None
+
+
+def verify_directory(directory, jobs=1, stream=False, chunk_size=DEFAULT_CHUNK_SIZE, max_errors=None):
+    print(f"{Style.BRIGHT}{Fore.CYAN}Verifying XML files in: {directory}{Style.RESET_ALL}")
+
+    input_files = [
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in sorted(names)
+        if name.lower().endswith(".xml")
+    ]
+    if not input_files:
+        print(f"{Fore.YELLOW}No XML files found in {directory}")
+        return True
+
+    invalid = 0
+    total_size = 0
+    start = time.perf_counter()
+    # Files are verified in a pool of worker processes and reported as they finish
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(_verify_file, input_file, stream, chunk_size, max_errors) for input_file in input_files]
+        for future in as_completed(futures):
+            input_file, size, error_count, failure = future.result()
+            total_size += size
+            if failure is not None:
+                invalid += 1
+                print(f"{Fore.RED}ERROR   {input_file}: {failure}")
+            elif error_count:
+                invalid += 1
+                print(f"{Fore.RED}INVALID {input_file} ({error_count} errors)")
+            else:
+                print(f"{Fore.GREEN}VALID   {input_file}")
+    elapsed = max(time.perf_counter() - start, 1e-9)
+
+    megabytes = total_size / (1 << 20)
+    print(f"{Fore.CYAN}Verified {len(input_files)} files ({megabytes:.2f} MB) in {elapsed:.2f}s: "
+          f"{len(input_files) / elapsed:.1f} files/s, {megabytes / elapsed:.2f} MB/s")
+    if invalid:
+        print(f"{Fore.RED}{invalid} of {len(input_files)} files are invalid.")
+    return invalid == 0
+
 
-def format_xml(input_file, output_file):
+def format_xml(input_file, output_file, jobs=1, binary=False):
     print(f"{Style.BRIGHT}{Fore.CYAN}Formatting XML file: {input_file}{Style.RESET_ALL}")
 
     base_filename = os.path.splitext(input_file)[0] # Get the base filename without extension
     if not output_file:
         output_file = f"{base_filename}_formatted.xml"
 
-    formatter = XMLFormatter(input_file)
+    formatter = XMLFormatter(input_file, workers=jobs, binary=binary)
     try:
         output_file = output_file or get_default_output(input_file, "format")
         formatter.prettify(output_file)
@@ -106,7 +181,7 @@ def format_xml(input_file, output_file):
         print(f"{Fore.RED}Error during XML formatting: {e}")
 
 
-def convert_to_json(input_file, output_file):
+def convert_to_json(input_file, output_file, stream=False, chunk_size=DEFAULT_CHUNK_SIZE):
     print(f"{Style.BRIGHT}{Fore.CYAN}Converting XML file: {input_file} to JSON.{Style.RESET_ALL}")
 
     base_filename = os.path.splitext(input_file)[0]  # Get the base filename without extension
@@ -114,7 +189,7 @@ def convert_to_json(input_file, output_file):
         output_file = f"{base_filename}.json"
 
     try:
-        converter = XMLToJSONConverter(input_file)
+        converter = XMLToJSONConverter(input_file, stream=stream, chunk_size=chunk_size)
         output_file = output_file or get_default_output(input_file, "json")
         converter.convert(output_file)
         print(f"{Fore.GREEN}JSON saved to {output_file}")
@@ -127,14 +202,14 @@ def convert_to_json(input_file, output_file):
 
 
 
-def minify_xml(input_file, output_file):
+def minify_xml(input_file, output_file, binary=False):
     print(f"{Style.BRIGHT}{Fore.CYAN}Minifying XML file: {input_file}{Style.RESET_ALL}")
     
     base_filename = os.path.splitext(input_file)[0] # Get the base filename without extension
     if not output_file:
         output_file = f"{base_filename}_minified.xml"
 
-    minifier = XMLMinifier(input_file) 
+    minifier = XMLMinifier(input_file, binary=binary)
     try:
         output_file = output_file or get_default_output(input_file, "minify")
         minifier.minify(output_file)
@@ -143,7 +218,7 @@ def minify_xml(input_file, output_file):
         print(f"{Fore.RED}Error during XML minification: {e}")
 
 
-def compress_xml(input_file, output_file):
+def compress_xml(input_file, output_file, method=TAGS, huffman=False, jobs=1, block_size=None, dictionary=None):
     print(f"{Style.BRIGHT}{Fore.CYAN}Compressing XML file: {input_file}{Style.RESET_ALL}")
 
     base_filename = os.path.splitext(input_file)[0] # Get the base filename without extension
@@ -151,17 +226,22 @@ def compress_xml(input_file, output_file):
         output_file = f"{base_filename}_compressed.xml"
 
     print(f"{Fore.YELLOW}(Original File size: {os.path.getsize(input_file)} bytes)")
-    compressor = XMLCompressor(input_file)
     try:
+        compressor = XMLCompressor(input_file, method=method, huffman=huffman, workers=jobs,
+                                   block_size=block_size or BLOCK_SIZE, dictionary=dictionary)
         output_file = output_file or get_default_output(input_file, "compress")
+        start = time.perf_counter()
         compressor.compress(output_file)
+        elapsed = max(time.perf_counter() - start, 1e-9)
         print(f"{Fore.GREEN}Compressed XML saved to {output_file}")
         print(f"{Fore.YELLOW}(Compressed File size: {os.path.getsize(output_file)} bytes)")
+        # Throughput is measured on the uncompressed size in both directions
+        print(f"{Fore.CYAN}Compressed in {elapsed:.2f}s: {os.path.getsize(input_file) / (1 << 20) / elapsed:.2f} MB/s")
     except Exception as e:
         print(f"{Fore.RED}Error during XML compression: {e}")
 
 
-def decompress_xml(input_file, output_file):
+def decompress_xml(input_file, output_file, jobs=1, dictionary=None):
     print(f"{Style.BRIGHT}{Fore.CYAN}Decompressing file: {input_file}{Style.RESET_ALL}")
 
     base_filename = os.path.splitext(input_file)[0] # Get the base filename without extension
@@ -169,15 +249,68 @@ def decompress_xml(input_file, output_file):
         output_file = f"{base_filename}_decompressed.xml"
 
     print(f"{Fore.YELLOW}(Original File size: {os.path.getsize(input_file)} bytes)")
-    decompressor = XMLDecompressor(input_file)
+    decompressor = XMLDecompressor(input_file, workers=jobs, dictionary=dictionary)
     try:
         output_file = output_file or get_default_output(input_file, "decompress")
+        start = time.perf_counter()
         decompressor.decompress(output_file)
+        elapsed = max(time.perf_counter() - start, 1e-9)
         print(f"{Fore.GREEN}Decompressed XML saved to {output_file}")
         print(f"{Fore.YELLOW}(Decompressed File size: {os.path.getsize(output_file)} bytes)")
+        print(f"{Fore.CYAN}Decompressed in {elapsed:.2f}s: {os.path.getsize(output_file) / (1 << 20) / elapsed:.2f} MB/s")
     except Exception as e:
         print(f"{Fore.RED}Error during decompression: {e}")
 
+def benchmark_codecs(input_file, method=None):
+    print(f"{Style.BRIGHT}{Fore.CYAN}Benchmarking codecs on: {input_file}{Style.RESET_ALL}")
+
+    with open(input_file, 'rb') as file:
+        data = file.read().replace(b'\r\n', b'\n')
+    specs = xml_codecs.codec_names()
+    # A chain given with -m is benchmarked along with the single codecs
+    if method and method not in specs:
+        specs.append(method)
+    print(f"{Fore.YELLOW}(Original File size: {len(data)} bytes)")
+    print(f"{'codec':<20}{'size':>12}{'ratio':>8}{'compress':>14}{'decompress':>14}")
+    try:
+        for spec, size, ratio, compress_speed, decompress_speed, ok in xml_codecs.benchmark(data, specs):
+            color = Fore.GREEN if ok else Fore.RED
+            print(f"{color}{spec:<20}{size:>12}{ratio:>8.2f}{compress_speed:>9.2f} MB/s{decompress_speed:>9.2f} MB/s"
+                  f"{'' if ok else '  round trip FAILED'}")
+    except Exception as e:
+        print(f"{Fore.RED}Error during benchmark: {e}")
+
+def train_dictionary(input_files, output_file, size=DICTIONARY_SIZE):
+    print(f"{Style.BRIGHT}{Fore.CYAN}Training a dictionary on {len(input_files)} file(s){Style.RESET_ALL}")
+    try:
+        XMLCompressor.train_dictionary(input_files, output_file, size)
+        print(f"{Fore.GREEN}Dictionary saved to {output_file}")
+        print(f"{Fore.YELLOW}(Dictionary size: {os.path.getsize(output_file)} bytes)")
+    except Exception as e:
+        print(f"{Fore.RED}Error during dictionary training: {e}")
+
+def extract_elements(input_file, output_file=None, position=None, stop=None, element_id=None, dictionary=None):
+    print(f"{Style.BRIGHT}{Fore.CYAN}Extracting from file: {input_file}{Style.RESET_ALL}")
+
+    decompressor = XMLDecompressor(input_file, dictionary=dictionary)
+    try:
+        if element_id is not None:
+            element = decompressor.extract_by_id(element_id)
+            if element is None:
+                print(f"{Fore.RED}No element with id {element_id}")
+                return
+            elements = [element]
+        else:
+            elements = decompressor.extract(position, stop)
+        if output_file:
+            with open(output_file, 'w', encoding='utf-8') as file:
+                file.write("\n".join(elements))
+            print(f"{Fore.GREEN}{len(elements)} element(s) saved to {output_file}")
+        else:
+            print("\n".join(elements))
+    except Exception as e:
+        print(f"{Fore.RED}Error during extraction: {e}")
+
 def cascade_operations(input_file, output_file, operations):
     # Check if the input file has an extension, if not, append '.xml'
     if not os.path.splitext(input_file)[1]:
@@ -385,38 +518,79 @@ def main():
 
     # Verify command
     verify_parser = subparsers.add_parser("verify", help="Check XML consistency")
-    verify_parser.add_argument("-i", "--input", required=True, help="Input XML file")
+    verify_parser.add_argument("-i", "--input", help="Input XML file")
+    verify_parser.add_argument("-r", "--recursive", metavar="DIR", help="Verify every XML file under a directory")
     verify_parser.add_argument("-f", "--fix", action="store_true", help="Fix errors in XML")
     verify_parser.add_argument("-o", "--output", help="Output file for fixed XML")
+    verify_parser.add_argument("-s", "--stream", action="store_true", help="Read the file in chunks instead of loading it whole")
+    verify_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Chunk size in characters for --stream")
+    verify_parser.add_argument("-j", "--jobs", type=positive_int, default=1, help="Number of worker processes to verify with")
+    verify_parser.add_argument("-m", "--max-errors", type=positive_int, help="Stop after this many errors")
+    verify_parser.add_argument("-c", "--count", action="store_true", help="Only print error counts per tag")
 
     # Format command
     format_parser = subparsers.add_parser("format", help="Prettify XML")
     format_parser.add_argument("-i", "--input", required=True, help="Input XML file")
     format_parser.add_argument("-o", "--output", help="Output formatted XML file")
+    format_parser.add_argument("-j", "--jobs", type=positive_int, default=1, help="Number of worker processes to format with")
+    format_parser.add_argument("-b", "--bytes", action="store_true", help="Format the raw bytes without decoding them")
 
     # JSON command
     json_parser = subparsers.add_parser("json", help="Convert XML to JSON")
     json_parser.add_argument("-i", "--input", required=True, help="Input XML file")
     json_parser.add_argument("-o", "--output", help="Output JSON file")
+    json_parser.add_argument("-s", "--stream", action="store_true",
+                             help="Write the JSON while reading the file in chunks, in constant memory")
+    json_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Chunk size in characters for --stream")
 
     # Minify command
     mini_parser = subparsers.add_parser("mini", help="Minify XML")
     mini_parser.add_argument("-i", "--input", required=True, help="Input XML file")
     mini_parser.add_argument("-o", "--output", help="Output minified XML file")
+    mini_parser.add_argument("-b", "--bytes", action="store_true", help="Minify the raw bytes without decoding them")
 
     mini_parser = subparsers.add_parser("minify", help="Minify XML")
     mini_parser.add_argument("-i", "--input", required=True, help="Input XML file")
     mini_parser.add_argument("-o", "--output", help="Output minified XML file")
+    mini_parser.add_argument("-b", "--bytes", action="store_true", help="Minify the raw bytes without decoding them")
 
     # Compress command
     compress_parser = subparsers.add_parser("compress", help="Compress XML")
     compress_parser.add_argument("-i", "--input", required=True, help="Input XML file")
     compress_parser.add_argument("-o", "--output", help="Output compressed file")
+    compress_parser.add_argument("-m", "--method", default=TAGS,
+                                 help="Codec, or codecs joined by '+' and applied left to right (e.g. tags+lzma): "
+                                      + "; ".join(f"{codec.name}: {codec.description}"
+                                                  for codec in xml_codecs.registered_codecs()))
+    compress_parser.add_argument("--huffman", action="store_true", help="Huffman code the output of the tags method")
+    compress_parser.add_argument("-j", "--jobs", type=positive_int, default=1, help="Number of worker processes to compress blocks with")
+    compress_parser.add_argument("--block-size", type=int, help=f"Bytes of document per block of -m blocks (default {BLOCK_SIZE})")
+    compress_parser.add_argument("-d", "--dictionary", help="Dictionary made with the train command, for -m blocks")
+    compress_parser.add_argument("--benchmark", action="store_true",
+                                 help="Run every codec on the input and print ratio and MB/s instead of compressing")
 
     # Decompress command
     decompress_parser = subparsers.add_parser("decompress", help="Decompress XML")
     decompress_parser.add_argument("-i", "--input", required=True, help="Input compressed file")
     decompress_parser.add_argument("-o", "--output", help="Output XML file")
+    decompress_parser.add_argument("-j", "--jobs", type=positive_int, default=1, help="Number of worker processes to decompress blocks with")
+    decompress_parser.add_argument("-d", "--dictionary", help="Dictionary the file was compressed with")
+
+    # Train command
+    train_parser = subparsers.add_parser("train", help="Train a compression dictionary on sample XML files")
+    train_parser.add_argument("-i", "--input", nargs='+', required=True, help="Sample XML files")
+    train_parser.add_argument("-o", "--output", required=True, help="Output dictionary file")
+    train_parser.add_argument("--size", type=int, default=DICTIONARY_SIZE, help="Dictionary size in bytes")
+
+    # Extract command
+    extract_parser = subparsers.add_parser("extract", help="Extract elements from a file compressed with -m blocks")
+    extract_parser.add_argument("-i", "--input", required=True, help="Input compressed file")
+    extract_parser.add_argument("-o", "--output", help="Output file (printed if omitted)")
+    extract_group = extract_parser.add_mutually_exclusive_group(required=True)
+    extract_group.add_argument("-n", "--position", type=int, help="Position of the element among the root's children")
+    extract_group.add_argument("-id", help="Text of the element's <id>")
+    extract_parser.add_argument("--stop", type=int, help="Extract the elements from --position up to this one")
+    extract_parser.add_argument("-d", "--dictionary", help="Dictionary the file was compressed with")
 
     # Cascaded operations command
     cascade_parser = subparsers.add_parser("cascade", help="Perform cascaded operations")
@@ -452,18 +626,38 @@ def main():
 
     args = parser.parse_args()
 
-    if args.command == "verify":
-        verify_xml(args.input, fix=args.fix, output_file=args.output)
+    if args.command == "verify" and args.recursive and (args.fix or args.output or args.count):
+        verify_parser.error("-f/--fix, -o/--output and -c/--count cannot be used with -r/--recursive")
+    elif args.command == "verify" and args.recursive:
+        verify_directory(args.recursive, jobs=args.jobs, stream=args.stream, chunk_size=args.chunk_size,
+                         max_errors=args.max_errors)
+    elif args.command == "verify" and args.count and (args.fix or args.output):
+        verify_parser.error("-f/--fix and -o/--output cannot be used with -c/--count")
+    elif args.command == "verify" and args.stream and args.jobs > 1:
+        verify_parser.error("-s/--stream cannot be used with -j/--jobs on a single file (workers read their own byte ranges)")
+    elif args.command == "verify" and not args.input:
+        verify_parser.error("one of the arguments -i/--input -r/--recursive is required")
+    elif args.command == "verify":
+        verify_xml(args.input, fix=args.fix, output_file=args.output, stream=args.stream, chunk_size=args.chunk_size, jobs=args.jobs,
+                   max_errors=args.max_errors, count_only=args.count)
     elif args.command == "format":
-        format_xml(args.input, args.output)
+        format_xml(args.input, args.output, jobs=args.jobs, binary=args.bytes)
     elif args.command == "json":
-        convert_to_json(args.input, args.output)
+        convert_to_json(args.input, args.output, stream=args.stream, chunk_size=args.chunk_size)
     elif args.command == "mini" or args.command == "minify":
-        minify_xml(args.input, args.output)
+        minify_xml(args.input, args.output, binary=args.bytes)
+    elif args.command == "compress" and args.benchmark:
+        benchmark_codecs(args.input, args.method)
     elif args.command == "compress":
-        compress_xml(args.input, args.output)
+        compress_xml(args.input, args.output, method=args.method, huffman=args.huffman, jobs=args.jobs,
+                     block_size=args.block_size, dictionary=args.dictionary)
     elif args.command == "decompress":
-        decompress_xml(args.input, args.output)
+        decompress_xml(args.input, args.output, jobs=args.jobs, dictionary=args.dictionary)
+    elif args.command == "train":
+        train_dictionary(args.input, args.output, size=args.size)
+    elif args.command == "extract":
+        extract_elements(args.input, args.output, position=args.position, stop=args.stop, element_id=args.id,
+                         dictionary=args.dictionary)
     elif args.command == "cascade":
         cascade_operations(args.input, args.output, args.operations)
     
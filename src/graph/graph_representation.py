@@ -1,3 +1,6 @@
+from src.utils.file_utils import map_file
+
+
 class Post:
     def __init__(self, body, topics):
         self.body = body
@@ -64,7 +67,7 @@ class GraphRepresentation:
         self.graph = self
 
     @classmethod
-    def build_graph(cls, xml_file):
+    def build_graph(cls, xml_file, use_mmap=False):
         """
         Parses XML data and builds the graph.
         Nodes represent users, edges represent follower relationships.
@@ -73,9 +76,11 @@ class GraphRepresentation:
         ----------
         xml_file: xml
             file path to the xml file
+        use_mmap: bool
+            read the file through a memory mapping, one user block at a time
         """
 
-        users, adjacency_list, edges, connections = cls.parse_xml_to_graph(xml_file)
+        users, adjacency_list, edges, connections = cls.parse_xml_to_graph(xml_file, use_mmap)
 
         self = cls(users=users, adjacency_list=adjacency_list, edges=edges, connections=connections)
         return self
@@ -100,13 +105,21 @@ class GraphRepresentation:
         return node in self.adjacency_list
 
     @staticmethod
-    def parse_xml_to_graph(xml_file_path):
+    def parse_xml_to_graph(xml_file_path, use_mmap=False):
+        if use_mmap:
+            # Decode the user blocks one at a time from a mapping of the file
+            with map_file(xml_file_path) as xml_data:
+                return GraphRepresentation._parse_users(_iter_user_blocks(xml_data))
+
         # Split the text based on the user blocks
         with open(xml_file_path, "r") as xml_file:
             xml_text = xml_file.read()
 
         users_data = xml_text.split("<user>")[1:]
+        return GraphRepresentation._parse_users(users_data)
 
+    @staticmethod
+    def _parse_users(users_data):
         users = []
         edges = []
         adjacency_list = {}
@@ -150,6 +163,17 @@ class GraphRepresentation:
         return users, adjacency_list, edges , connections
 
 
+def _iter_user_blocks(data):
+    """Yields the decoded text after each <user> up to the next one, as split("<user>")[1:] would."""
+    start = data.find(b"<user>")
+    while start != -1:
+        start += len(b"<user>")
+        end = data.find(b"<user>", start)
+        block = data[start:end if end != -1 else len(data)].decode("utf-8")
+        yield block.replace("\r\n", "\n").replace("\r", "\n")
+        start = end
+
+
 def _get_value(data, start_tag, end_tag):
     """Extracts a value from the XML data between two tags."""
     start_index = data.find(start_tag) + len(start_tag)
@@ -6,3 +6,5 @@ from .xml_minifier import XMLMinifier
 from .xml_compressor import XMLCompressor
 from .xml_decompressor import XMLDecompressor
 from .xml_to_json import XMLToJSONConverter
+from .xml_tokenizer import XMLTokenizer
+from .structural_index import StructuralIndex
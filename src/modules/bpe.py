@@ -0,0 +1,177 @@
+import heapq
+
+import numpy as np
+
+# First bytes of a byte pair encoded file
+MAGIC = b"XBP\x01"
+# Bytes of input the merge table is learned from, taken in pieces spread over the file
+SAMPLE_SIZE = 256 << 10
+SAMPLE_PIECES = 16
+# Pairs seen fewer times than this in the sample are not worth a table entry
+MIN_COUNT = 4
+# Input bytes rewritten (or expanded) at a time
+CHUNK_SIZE = 1 << 20
+
+
+def learn_merges(data, symbols, min_count=MIN_COUNT):
+    """
+    Learn a byte pair encoding merge table: repeatedly replace the most
+    frequent pair of adjacent symbols with a new symbol.
+
+    The symbols live in a doubly linked array, so a merge only visits the
+    positions of the pair being replaced and updates the counts of their
+    neighbouring pairs. Pair counts are kept in a heap whose stale entries
+    are skipped when they come up, which makes the whole run O(n log n).
+
+    Args:
+        data (bytes): Input to learn from
+        symbols (list): Byte values free to stand for merged pairs
+        min_count (int): Stop once the most frequent pair is rarer than this
+
+    Returns:
+        list: (symbol, left, right) merges in the order they were made
+    """
+    n = len(data)
+    symbols = list(symbols)
+    merges = []
+    if n < 2 or not symbols:
+        return merges
+
+    sym = list(data)
+    nxt = list(range(1, n + 1))
+    nxt[-1] = -1
+    prv = list(range(-1, n - 1))
+
+    # Pairs are keyed by left << 8 | right; an occurrence is the position of
+    # the left symbol. Occurrence lists may hold positions that have since
+    # changed, which are checked when the pair is merged.
+    pairs = [left << 8 | right for left, right in zip(data, data[1:])]
+    counts = {}
+    occurrences = {}
+    for pos, key in enumerate(pairs):
+        found = occurrences.get(key)
+        if found is None:
+            occurrences[key] = [pos]
+            counts[key] = 1
+        else:
+            found.append(pos)
+            counts[key] += 1
+    del pairs
+    heap = [(-count, key) for key, count in counts.items()]
+    heapq.heapify(heap)
+
+    while symbols and heap:
+        negative, key = heapq.heappop(heap)
+        count = counts.get(key, 0)
+        if count != -negative:
+            # Stale entry: the pair lost occurrences since it was pushed
+            if count >= min_count:
+                heapq.heappush(heap, (-count, key))
+            continue
+        if count < min_count:
+            break
+
+        new = symbols.pop()
+        left, right = key >> 8, key & 0xFF
+        merges.append((new, left, right))
+        touched = set()
+        for pos in sorted(occurrences.pop(key)):
+            if sym[pos] != left:
+                continue
+            after = nxt[pos]
+            if after == -1 or sym[after] != right:
+                continue
+            before = prv[pos]
+            end = nxt[after]
+
+            counts[key] -= 1
+            if before != -1:
+                counts[sym[before] << 8 | left] -= 1
+            if end != -1:
+                counts[right << 8 | sym[end]] -= 1
+
+            # Replace the pair with the new symbol and unlink its right half
+            sym[pos] = new
+            sym[after] = -1
+            nxt[pos] = end
+            if end != -1:
+                prv[end] = pos
+
+            if before != -1:
+                pair = sym[before] << 8 | new
+                counts[pair] = counts.get(pair, 0) + 1
+                occurrences.setdefault(pair, []).append(before)
+                touched.add(pair)
+            if end != -1:
+                pair = new << 8 | sym[end]
+                counts[pair] = counts.get(pair, 0) + 1
+                occurrences.setdefault(pair, []).append(pos)
+                touched.add(pair)
+
+        del counts[key]
+        for pair in touched:
+            if counts[pair] >= min_count:
+                heapq.heappush(heap, (-counts[pair], pair))
+    return merges
+
+
+def _sample(data, size=SAMPLE_SIZE, pieces=SAMPLE_PIECES):
+    # Pieces spread evenly over data, so the table fits the whole file
+    if len(data) <= size:
+        return bytes(data)
+    piece = size // pieces
+    step = (len(data) - piece) // (pieces - 1)
+    return b"".join(data[k * step:k * step + piece] for k in range(pieces))
+
+
+def encode(data):
+    """
+    Byte pair encode a document into the byte values it does not use.
+
+    The merge table is learned on a sample and then applied to the whole
+    document with bytes.replace, one merge after the other, which gives the
+    same result as merging the pairs one by one. The output is the magic
+    bytes, the number of merges, a (new, left, right) triple per merge and
+    the encoded content.
+
+    Args:
+        data (bytes-like): Content to encode
+
+    Yields:
+        bytes: Consecutive pieces of the encoded file
+    """
+    used = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256) if len(data) else np.zeros(256)
+    free = np.flatnonzero(used == 0).tolist()
+    merges = learn_merges(_sample(data), free)
+    replacements = [(bytes((left, right)), bytes((new,))) for new, left, right in merges]
+
+    yield MAGIC + bytes((len(merges),)) + b"".join(bytes(merge) for merge in merges)
+    # A pair cut by a chunk boundary is just left as it is
+    for start in range(0, len(data), CHUNK_SIZE):
+        chunk = data[start:start + CHUNK_SIZE]
+        for pair, symbol in replacements:
+            chunk = chunk.replace(pair, symbol)
+        yield chunk
+
+
+def decode(file, chunk_size=CHUNK_SIZE):
+    """
+    Expand a file written by encode(), chunk_size bytes of input at a time.
+
+    Args:
+        file: Encoded file opened in binary mode
+
+    Yields:
+        bytes: Consecutive pieces of the decoded content
+    """
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a byte pair encoded file")
+    count = file.read(1)[0]
+    table = file.read(3 * count)
+    # Full expansion of every byte value, so each input byte is one lookup
+    expansions = [bytes((value,)) for value in range(256)]
+    for k in range(0, len(table), 3):
+        new, left, right = table[k:k + 3]
+        expansions[new] = expansions[left] + expansions[right]
+    for chunk in iter(lambda: file.read(chunk_size), b''):
+        yield b''.join(map(expansions.__getitem__, chunk))
@@ -0,0 +1,201 @@
+import heapq
+import struct
+
+import numpy as np
+
+# First bytes of a Huffman coded file
+MAGIC = b"XHF\x01"
+# Longest code allowed; past it the codes are rebuilt from flattened counts
+MAX_CODE_LENGTH = 20
+# Input bytes coded (or decoded) at a time
+CHUNK_SIZE = 1 << 16
+
+
+def code_lengths(counts, limit=MAX_CODE_LENGTH):
+    """
+    Huffman code length of every byte value.
+
+    The two rarest subtrees are merged with a heap until one is left. If a
+    code comes out longer than limit, the counts are halved (rare values
+    staying at 1) and the codes are built again.
+
+    Args:
+        counts (list): Number of occurrences of each of the 256 byte values
+        limit (int): Longest code allowed
+
+    Returns:
+        list: 256 code lengths, 0 for values that do not occur
+    """
+    counts = [int(count) for count in counts]
+    while True:
+        lengths = [0] * 256
+        heap = [(count, symbol, [symbol]) for symbol, count in enumerate(counts) if count]
+        if len(heap) == 1:
+            lengths[heap[0][1]] = 1
+        heapq.heapify(heap)
+        order = 256  # Tie breaker, so that lists are never compared
+        while len(heap) > 1:
+            first_count, _, first = heapq.heappop(heap)
+            second_count, _, second = heapq.heappop(heap)
+            for symbol in first + second:
+                lengths[symbol] += 1
+            heapq.heappush(heap, (first_count + second_count, order, first + second))
+            order += 1
+        if max(lengths) <= limit:
+            return lengths
+        counts = [(count + 1) // 2 for count in counts]
+
+
+def canonical_codes(lengths):
+    """
+    Canonical code of every byte value: codes are handed out in order of
+    length and then of value, so the lengths alone describe the code.
+
+    Returns:
+        dict: Byte value -> code (an int of that value's length in bits)
+    """
+    codes = {}
+    code = 0
+    previous = 0
+    for length, symbol in sorted((length, symbol) for symbol, length in enumerate(lengths) if length):
+        code <<= length - previous
+        codes[symbol] = code
+        code += 1
+        previous = length
+    return codes
+
+
+def encode(data):
+    """
+    Huffman code a document.
+
+    The output is the magic bytes, the number of coded bytes, the code
+    length of every byte value that occurs and then the codes packed most
+    significant bit first into bytes. Bits are packed with NumPy a chunk at a time, carrying the few
+    bits of an unfinished byte over to the next chunk.
+
+    Args:
+        data (bytes-like): Content to code
+
+    Yields:
+        bytes: Consecutive pieces of the coded file
+    """
+    symbols = np.frombuffer(data, dtype=np.uint8)
+    lengths = code_lengths(np.bincount(symbols, minlength=256))
+    used = [(symbol, length) for symbol, length in enumerate(lengths) if length]
+    yield (MAGIC + struct.pack("<QH", len(symbols), len(used))
+           + b"".join(bytes(pair) for pair in used))
+
+    # The codes of all byte values one after the other, one bit per byte
+    codes = canonical_codes(lengths)
+    code_bits = np.array([(codes[symbol] >> (length - 1 - k)) & 1
+                          for symbol, length in enumerate(lengths) for k in range(length)], dtype=np.uint8)
+    lengths = np.array(lengths)
+    offsets = np.cumsum(lengths) - lengths
+
+    carry = np.zeros(0, dtype=np.uint8)
+    for start in range(0, len(symbols), CHUNK_SIZE):
+        chunk = symbols[start:start + CHUNK_SIZE]
+        # Bit k of the output is bit k - first of the code of the symbol
+        # that covers it, where first is where that symbol's code begins
+        sizes = lengths[chunk]
+        firsts = np.cumsum(sizes) - sizes
+        bits = code_bits[np.arange(int(sizes.sum())) - np.repeat(firsts - offsets[chunk], sizes)]
+        if len(carry):
+            bits = np.concatenate((carry, bits))
+        whole = len(bits) - len(bits) % 8
+        yield np.packbits(bits[:whole]).tobytes()
+        carry = bits[whole:]
+    if len(carry):
+        yield np.packbits(carry).tobytes()
+
+
+def _decoding_tables(lengths):
+    # Tree of the code: children[node] holds, for bit 0 and bit 1, either an
+    # inner node or ~symbol for a leaf. A missing child (only with a single
+    # symbol) goes back to the root without output.
+    children = [[0, 0]]
+    codes = canonical_codes(lengths)
+    for symbol, code in codes.items():
+        node = 0
+        length = lengths[symbol]
+        for k in range(length - 1, 0, -1):
+            bit = (code >> k) & 1
+            if children[node][bit] <= 0:
+                children[node][bit] = len(children)
+                children.append([0, 0])
+            node = children[node][bit]
+        children[node][code & 1] = ~symbol
+
+    # Output and next node for each node and 4 bits, then for each node and
+    # a whole byte made of two of those steps
+    steps = []
+    for node in range(len(children)):
+        row = []
+        for nibble in range(16):
+            output = bytearray()
+            state = node
+            for k in (3, 2, 1, 0):
+                child = children[state][(nibble >> k) & 1]
+                if child < 0:
+                    output.append(~child)
+                    state = 0
+                else:
+                    state = child
+            row.append((bytes(output), state))
+        steps.append(row)
+
+    outputs = []
+    states = []
+    for node in range(len(children)):
+        row = steps[node]
+        for byte in range(256):
+            high, middle = row[byte >> 4]
+            low, state = steps[middle][byte & 15]
+            outputs.append(high + low)
+            # Kept shifted, so that the next lookup is state | byte
+            states.append(state << 8)
+    return outputs, states
+
+
+def decode(data):
+    """
+    Decode the content of a file written by encode().
+
+    Every byte of input is decoded with one lookup in a table indexed by the
+    node of the code tree reached so far and the byte, which gives the
+    decoded bytes and the next node.
+
+    Args:
+        data (bytes-like): Content of the coded file
+
+    Yields:
+        bytes: Consecutive pieces of the decoded content
+    """
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError("Not a Huffman coded file")
+    remaining, used = struct.unpack_from("<QH", data, len(MAGIC))
+    offset = len(MAGIC) + struct.calcsize("<QH")
+    lengths = [0] * 256
+    for k in range(offset, offset + 2 * used, 2):
+        lengths[data[k]] = data[k + 1]
+    offset += 2 * used
+    if not remaining:
+        return
+
+    outputs, states = _decoding_tables(lengths)
+    state = 0
+    for start in range(offset, len(data), CHUNK_SIZE):
+        result = []
+        append = result.append
+        for byte in data[start:start + CHUNK_SIZE]:
+            key = state | byte
+            append(outputs[key])
+            state = states[key]
+        result = b"".join(result)
+        # The padding bits of the last byte may decode to extra symbols
+        if len(result) >= remaining:
+            yield result[:remaining]
+            return
+        remaining -= len(result)
+        yield result
@@ -0,0 +1,122 @@
+import numpy as np
+
+
+class StructuralIndex:
+    """
+    Positions of the structural bytes of an XML document.
+
+    The document is loaded as raw bytes and viewed through np.frombuffer, and
+    the offsets of '<', '>', '/', '?', '!', quotes and line breaks are found
+    with vectorized comparisons (in the spirit of stage 1 of simdjson). The
+    XML modules then jump between those offsets instead of walking the text
+    one character at a time.
+
+    All offsets are byte offsets into `data`, which is assumed to be UTF-8
+    (or ASCII) with '\\n' or '\\r\\n' line breaks.
+    """
+
+    def __init__(self, data):
+        """
+        Args:
+            data (bytes): Raw XML content
+        """
+        self.data = data
+        self.array = np.frombuffer(data, dtype=np.uint8)
+        self._positions = {}
+        self._continuations = None
+
+    @classmethod
+    def from_file(cls, file_path):
+        """
+        Build the index for a file.
+
+        Args:
+            file_path (str): Path to the XML file
+
+        Returns:
+            StructuralIndex: Index over the file's bytes
+        """
+        with open(file_path, 'rb') as file:
+            return cls(file.read())
+
+    def positions(self, char):
+        """
+        Sorted offsets of every occurrence of a single ASCII character.
+
+        Args:
+            char (str): The character to locate, e.g. '<'
+
+        Returns:
+            numpy.ndarray: int64 offsets in increasing order
+        """
+        positions = self._positions.get(char)
+        if positions is None:
+            positions = np.flatnonzero(self.array == ord(char))
+            self._positions[char] = positions
+        return positions
+
+    def next_positions(self, char, starts):
+        """
+        For each offset in starts, the first occurrence of char at or after it,
+        or len(data) if there is none.
+        """
+        positions = self.positions(char)
+        found = np.searchsorted(positions, starts)
+        return np.append(positions, len(self.data))[found]
+
+    def count_between(self, char, starts, ends):
+        """
+        For each pair of offsets, how many times char occurs in [start, end).
+        """
+        positions = self.positions(char)
+        return np.searchsorted(positions, ends) - np.searchsorted(positions, starts)
+
+    def lines(self, offsets):
+        """
+        0-based line number of each offset.
+        """
+        return np.searchsorted(self.positions('\n'), offsets)
+
+    def columns(self, offsets, lines=None):
+        """
+        0-based column of each offset, counted in characters rather than bytes.
+        """
+        if lines is None:
+            lines = self.lines(offsets)
+        newlines = self.positions('\n')
+        line_starts = np.append(0, newlines + 1)[lines]
+        columns = offsets - line_starts
+
+        if self._continuations is None:
+            # UTF-8 continuation bytes (10xxxxxx) do not start a character
+            self._continuations = np.flatnonzero((self.array & 0xC0) == 0x80)
+        if len(self._continuations):
+            columns -= (np.searchsorted(self._continuations, offsets)
+                        - np.searchsorted(self._continuations, line_starts))
+        return columns
+
+    def tag_spans(self):
+        """
+        Locate every tag the XML modules care about.
+
+        A tag starts at a '<' and its name runs up to the next space, '>' or
+        line break (a line break is included in the name, as the line-based
+        scanners did). Declarations and comments, whose names contain '?' or
+        '!', and tags with an empty name are left out.
+
+        Returns:
+            tuple: (starts, ends, nested) arrays where starts holds the offset
+            of each '<', [start + 1, end) is the raw name, and nested flags
+            names that contain further '<' characters.
+        """
+        starts = self.positions('<')
+        names = starts + 1
+        ends = np.minimum(self.next_positions(' ', names), self.next_positions('>', names))
+        ends = np.minimum(ends, self.next_positions('\n', names) + 1)
+        ends = np.minimum(ends, len(self.data))
+
+        keep = ends > names
+        keep &= self.count_between('?', names, ends) == 0
+        keep &= self.count_between('!', names, ends) == 0
+        nested = self.count_between('<', names, ends) > 0
+        return starts[keep], ends[keep], nested[keep]
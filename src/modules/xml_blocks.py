@@ -0,0 +1,354 @@
+import bisect
+import json
+import re
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.modules.structural_index import StructuralIndex
+from src.modules.xml_dictionary import dictionary_id
+
+# First (and last) bytes of every block file
+MAGIC = b"XBK\x01"
+# Bytes of document gathered into one block before it is compressed
+BLOCK_SIZE = 1 << 20
+
+# The footer is found through a fixed-size trailer at the end of the file:
+# its offset and size, then the magic bytes again
+_TRAILER = struct.Struct("<QQ")
+_TRAILER_SIZE = _TRAILER.size + len(MAGIC)
+# Comments and CDATA sections, whose '<' and '>' are not markup. One that is
+# never closed runs to the end of the document.
+_SKIPPED = re.compile(rb"<!--.*?(?:-->|\Z)|<!\[CDATA\[.*?(?:\]\]>|\Z)", re.S)
+# Input scanned for element boundaries at a time
+_SLICE_SIZE = 16 << 20
+
+
+def _slices(data, skipped):
+    # Pieces of about _SLICE_SIZE bytes, each cut right before a '<' that is
+    # not inside a comment or CDATA section
+    start = 0
+    while start < len(data):
+        end = data.find(b"<", start + _SLICE_SIZE)
+        if end != -1:
+            k = bisect.bisect_right(skipped, (end, len(data))) - 1
+            if k >= 0 and skipped[k][1] > end:
+                end = data.find(b"<", skipped[k][1])
+        if end == -1:
+            end = len(data)
+        yield start, data[start:end]
+        start = end
+
+
+def element_spans(data):
+    """
+    Find the children of the root element.
+
+    The depth of every tag is worked out with NumPy over the structural
+    index: +1 for a start tag, -1 for an end tag and 0 for an empty-element
+    tag, added up in document order. Declarations, comments and CDATA
+    sections are left out.
+
+    Args:
+        data (bytes-like): XML document
+
+    Returns:
+        list: (start, end) byte offsets of every child of the root, or None if
+        the tags are not properly nested
+    """
+    skipped = [match.span() for match in _SKIPPED.finditer(data)]
+    skipped_starts = np.array([span[0] for span in skipped], dtype=np.int64)
+    skipped_ends = np.array([span[1] for span in skipped], dtype=np.int64)
+
+    starts = []
+    ends = []
+    depth = 0
+    for offset, piece in _slices(data, skipped):
+        index = StructuralIndex(piece)
+        array = index.array
+        tags = index.positions("<")
+        # Offsets of the '<' in the whole document, minus skipped sections
+        absolute = tags + offset
+        if skipped:
+            inside = np.searchsorted(skipped_starts, absolute, side="right") - 1
+            tags = tags[(inside < 0) | (absolute >= skipped_ends[np.maximum(inside, 0)])]
+        closes = index.next_positions(">", tags)
+        if len(tags) and closes[-1] == len(piece):
+            return None
+        following = array[np.minimum(tags + 1, len(piece) - 1)]
+        keep = (following != ord("?")) & (following != ord("!"))
+        tags, closes, following = tags[keep], closes[keep], following[keep]
+
+        closing = following == ord("/")
+        empty = ~closing & (array[np.maximum(closes - 1, 0)] == ord("/"))
+        delta = np.where(closing, -1, np.where(empty, 0, 1))
+        after = depth + np.cumsum(delta)
+        before = after - delta
+        if len(after) and after.min() < 0:
+            return None
+        depth = int(after[-1]) if len(after) else depth
+
+        children = ~closing & (before == 1)
+        starts.append(tags[children] + offset)
+        ends.append(np.concatenate((closes[children & empty], closes[closing & (after == 1)])) + offset + 1)
+
+    starts = np.concatenate(starts) if starts else np.zeros(0, dtype=np.int64)
+    ends = np.sort(np.concatenate(ends)) if ends else np.zeros(0, dtype=np.int64)
+    if depth != 0 or len(starts) != len(ends):
+        return None
+    if np.any(starts >= ends) or np.any(ends[:-1] > starts[1:]):
+        return None
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def _element_id(data, start, end):
+    # Text of the first <id> element inside data[start:end], or b""
+    found = data.find(b"<id>", start, end)
+    if found == -1:
+        return b""
+    found += len(b"<id>")
+    close = data.find(b"</id>", found, end)
+    return bytes(data[found:close]).strip() if close != -1 else b""
+
+
+def _block_bounds(spans, size, block_size):
+    # (start, end, first element, element count) of every block
+    if not spans:
+        return [(start, min(start + block_size, size), 0, 0) for start in range(0, size, block_size)]
+    firsts = np.array([start for start, _ in spans])
+    cuts = np.flatnonzero(np.diff((firsts - firsts[0]) // block_size)) + 1
+    firsts_of_blocks = [0] + cuts.tolist()
+    bounds = []
+    for k, first in enumerate(firsts_of_blocks):
+        last = firsts_of_blocks[k + 1] if k + 1 < len(firsts_of_blocks) else len(spans)
+        end = spans[last][0] if last < len(spans) else spans[-1][1]
+        bounds.append((spans[first][0], end, first, last - first))
+    return bounds
+
+
+def _compress(data, level, dictionary=None):
+    # zlib.compress, primed with a preset dictionary if there is one
+    if not dictionary:
+        return zlib.compress(data, level)
+    compressor = zlib.compressobj(level, zdict=dictionary)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _decompress(data, dictionary=None):
+    if not dictionary:
+        return zlib.decompress(data)
+    decompressor = zlib.decompressobj(zdict=dictionary)
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def _map_in_order(function, calls, workers):
+    """
+    Results of function(*args) for each args in calls, in order. With
+    workers > 1 the calls run in a process pool, with a bounded number in
+    flight so that finished results do not pile up in memory.
+    """
+    if workers <= 1:
+        for args in calls:
+            yield function(*args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for args in calls:
+            pending.append(executor.submit(function, *args))
+            if len(pending) > 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def encode(data, block_size=BLOCK_SIZE, level=6, workers=1, dictionary=None):
+    """
+    Compress an XML document into independently compressed blocks, each made
+    of whole children of the root, with an index in a footer.
+
+    The file holds the magic bytes, the zlib-compressed blocks, the text
+    before the first and after the last child (prolog and epilog), and a
+    footer with the offset, size and first element of every block, the span
+    of every element inside its block and the text of its first <id>. A
+    fixed-size trailer points at the footer, so a reader can find any element
+    by its position or id and decompress only the block holding it.
+
+    A document whose elements cannot be delimited is cut into blocks at
+    arbitrary offsets, with no element index.
+
+    With a preset dictionary (see xml_dictionary) every block starts out
+    knowing the tags and words common to such documents, so small blocks
+    compress almost as well as large ones. The file records which
+    dictionary it needs.
+
+    Args:
+        data (bytes-like): UTF-8 XML document
+        block_size (int): Bytes of document per block, rounded to whole elements
+        level (int): zlib compression level
+        workers (int): Number of processes compressing blocks
+        dictionary (bytes): zlib preset dictionary for the blocks
+
+    Yields:
+        bytes: Consecutive pieces of the block file
+    """
+    spans = element_spans(data) or []
+    size = len(data)
+    yield MAGIC
+    offset = len(MAGIC)
+
+    blocks = []
+    relative = []
+    bounds = _block_bounds(spans, size, block_size)
+    calls = ((data[start:end], level, dictionary) for start, end, _, _ in bounds)
+    for (start, end, first, count), compressed in zip(bounds, _map_in_order(_compress, calls, workers)):
+        blocks.append([offset, len(compressed), first, count])
+        for span_start, span_end in spans[first:first + count]:
+            relative.append(span_start - start)
+            relative.append(span_end - start)
+        offset += len(compressed)
+        yield compressed
+
+    sections = {}
+    prolog_end = spans[0][0] if spans else 0
+    epilog_start = spans[-1][1] if spans else size
+    for name, piece in (("prolog", data[:prolog_end]), ("epilog", data[epilog_start:])):
+        compressed = _compress(piece, level, dictionary)
+        sections[name] = [offset, len(compressed)]
+        offset += len(compressed)
+        yield compressed
+
+    spans_section = zlib.compress(np.array(relative, dtype="<u4").tobytes(), level)
+    ids_section = zlib.compress(b"\0".join(_element_id(data, start, end) for start, end in spans), level)
+    header = json.dumps({
+        "codec": "zlib",
+        "dictionary": dictionary_id(dictionary) if dictionary else None,
+        "elements": len(spans),
+        "blocks": blocks,
+        "sizes": [len(spans_section), len(ids_section)],
+        **sections,
+    }).encode("utf-8")
+    footer = struct.pack("<I", len(header)) + header + spans_section + ids_section
+    yield footer
+    yield _TRAILER.pack(offset, len(footer)) + MAGIC
+
+
+def is_block_file(data):
+    """
+    Tell whether data (the start of a file is enough) is in the block format.
+    """
+    return bytes(data[:len(MAGIC)]) == MAGIC
+
+
+class BlockIndex:
+    """
+    Footer of a block file, read once, through which elements are extracted
+    by seeking to the one block that holds them.
+    """
+
+    def __init__(self, file, dictionary=None):
+        """
+        Args:
+            file: Block file opened in binary mode
+            dictionary (bytes): Preset dictionary the file was compressed with
+
+        Raises:
+            ValueError: If the file is not a block file, or needs a dictionary
+                other than the one given
+        """
+        self.file = file
+        file.seek(-_TRAILER_SIZE, 2)
+        trailer = file.read(_TRAILER_SIZE)
+        if trailer[_TRAILER.size:] != MAGIC or not is_block_file(self._read(0, len(MAGIC))):
+            raise ValueError("Not a block file")
+        offset, size = _TRAILER.unpack_from(trailer)
+        footer = self._read(offset, size)
+
+        (header_size,) = struct.unpack_from("<I", footer)
+        header = json.loads(footer[4:4 + header_size])
+        self.blocks = header["blocks"]
+        self.prolog = header["prolog"]
+        self.epilog = header["epilog"]
+        self.length = header["elements"]
+        needed = header.get("dictionary")
+        if needed != (dictionary_id(dictionary) if dictionary else None):
+            raise ValueError("The file needs the dictionary it was compressed with" if needed
+                             else "The file was compressed without a dictionary")
+        self.dictionary = dictionary
+        self._firsts = [block[2] for block in self.blocks]
+
+        spans_size, ids_size = header["sizes"]
+        offset = 4 + header_size
+        self.spans = np.frombuffer(zlib.decompress(footer[offset:offset + spans_size]), dtype="<u4")
+        self._ids_section = footer[offset + spans_size:offset + spans_size + ids_size]
+        self._ids = None
+        self._cached = (None, None)
+
+    def __len__(self):
+        return self.length
+
+    def _read(self, offset, size):
+        self.file.seek(offset)
+        return self.file.read(size)
+
+    def section(self, location):
+        """
+        Decompressed content of a [offset, size] section (a block, the prolog or the epilog).
+        """
+        return _decompress(self._read(*location[:2]), self.dictionary)
+
+    def block(self, k):
+        """
+        Decompressed content of block k; the last block read is kept for the next call.
+        """
+        if self._cached[0] != k:
+            self._cached = (k, self.section(self.blocks[k]))
+        return self._cached[1]
+
+    def elements(self, start, stop):
+        """
+        Yield the elements with ordinals in [start, stop), reading each block once.
+
+        Raises:
+            IndexError: Unless 0 <= start < stop <= the number of elements
+        """
+        if not 0 <= start < stop <= self.length:
+            raise IndexError(f"Element positions [{start}, {stop}) out of range: the file has {self.length} elements")
+        for ordinal in range(start, stop):
+            k = bisect.bisect_right(self._firsts, ordinal) - 1
+            data = self.block(k)
+            yield data[int(self.spans[2 * ordinal]):int(self.spans[2 * ordinal + 1])]
+
+    def ordinal(self, element_id):
+        """
+        Ordinal of the first element whose first <id> is element_id, or None.
+        """
+        if self._ids is None:
+            self._ids = {}
+            ids = zlib.decompress(self._ids_section).split(b"\0") if self.length else []
+            for ordinal, found in enumerate(ids):
+                self._ids.setdefault(found, ordinal)
+        if isinstance(element_id, str):
+            element_id = element_id.encode("utf-8")
+        return self._ids.get(element_id.strip())
+
+
+def decode(file, workers=1, dictionary=None):
+    """
+    Rebuild the whole document from a block file.
+
+    Args:
+        file: Block file opened in binary mode
+        workers (int): Number of processes decompressing blocks
+        dictionary (bytes): Preset dictionary the file was compressed with
+
+    Yields:
+        bytes: Consecutive blocks of the document
+    """
+    index = BlockIndex(file, dictionary)
+    yield index.section(index.prolog)
+    calls = ((index._read(offset, size), dictionary) for offset, size, _, _ in index.blocks)
+    yield from _map_in_order(_decompress, calls, workers)
+    yield index.section(index.epilog)
@@ -0,0 +1,238 @@
+import bz2
+import io
+import lzma
+import re
+import time
+import zlib
+
+from src.modules import bpe, huffman, xml_blocks, xml_containers
+from src.modules.structural_index import StructuralIndex
+
+# First bytes of a file written through the registry; the codec chain
+# follows, so that the file can be decoded without being told how
+CODEC_MAGIC = b"XCC\x01"
+# Joins codec names into a chain, applied from left to right
+CHAIN_SEPARATOR = "+"
+
+_CLOSING_TAG = re.compile(rb"</[^>]+>")
+
+
+class Codec:
+    """
+    A named pair of functions turning bytes into compressed bytes and back.
+    """
+
+    def __init__(self, name, encode, decode, description=""):
+        self.name = name
+        self.encode = encode
+        self.decode = decode
+        self.description = description
+
+
+_CODECS = {}
+
+
+def register_codec(name, encode, decode, description=""):
+    """
+    Make a codec available to XMLCompressor, XMLDecompressor and the CLI.
+
+    Args:
+        name (str): Name the codec is selected by (it cannot contain '+')
+        encode (callable): bytes -> compressed bytes
+        decode (callable): compressed bytes -> bytes
+        description (str): One line shown in the CLI help
+    """
+    if not name or CHAIN_SEPARATOR in name:
+        raise ValueError(f"Invalid codec name: {name!r}")
+    _CODECS[name] = Codec(name, encode, decode, description)
+
+
+def registered_codecs():
+    """
+    The registered Codec objects, in registration order.
+    """
+    return list(_CODECS.values())
+
+
+def codec_names():
+    """
+    Names of the registered codecs, in registration order.
+    """
+    return list(_CODECS)
+
+
+def get_chain(spec):
+    """
+    Codecs of a chain such as "tags+lzma".
+
+    Returns:
+        list: Codec objects, in the order they are applied when encoding
+
+    Raises:
+        ValueError: If a name in the chain is not registered
+    """
+    chain = []
+    for name in spec.split(CHAIN_SEPARATOR):
+        codec = _CODECS.get(name.strip())
+        if codec is None:
+            raise ValueError(f"Unknown codec: {name} (available: {', '.join(_CODECS)})")
+        chain.append(codec)
+    return chain
+
+
+def is_codec_file(data):
+    """
+    Tell whether data (the start of a file is enough) was written by encode().
+    """
+    return bytes(data[:len(CODEC_MAGIC)]) == CODEC_MAGIC
+
+
+def encode(data, spec):
+    """
+    Run data through a chain of codecs.
+
+    Args:
+        data (bytes-like): Content to compress
+        spec (str): Codec names joined by '+'
+
+    Returns:
+        bytes: The magic bytes, the chain and the compressed content
+    """
+    chain = get_chain(spec)
+    for codec in chain:
+        data = codec.encode(data)
+    spec = CHAIN_SEPARATOR.join(codec.name for codec in chain).encode("utf-8")
+    return CODEC_MAGIC + bytes((len(spec),)) + spec + data
+
+
+def decode(data):
+    """
+    Undo encode(): the chain is read from the data and run backwards.
+    """
+    if not is_codec_file(data):
+        raise ValueError("Not a codec file")
+    size = data[len(CODEC_MAGIC)]
+    start = len(CODEC_MAGIC) + 1
+    spec = bytes(data[start:start + size]).decode("utf-8")
+    data = data[start + size:]
+    for codec in reversed(get_chain(spec)):
+        data = codec.decode(data)
+    return data
+
+
+def benchmark(data, specs=None):
+    """
+    Compress and decompress data with every codec (or chain) in specs.
+
+    Args:
+        data (bytes): Content to compress
+        specs (list): Codec chains to run, every registered codec by default
+
+    Returns:
+        list: (spec, compressed size, ratio, compress MB/s, decompress MB/s,
+        round trip ok) for every chain
+    """
+    megabytes = len(data) / (1 << 20)
+    rows = []
+    for spec in specs or codec_names():
+        start = time.perf_counter()
+        compressed = encode(data, spec)
+        compress_time = max(time.perf_counter() - start, 1e-9)
+        start = time.perf_counter()
+        restored = decode(compressed)
+        decompress_time = max(time.perf_counter() - start, 1e-9)
+        rows.append((spec, len(compressed), len(data) / max(len(compressed), 1),
+                     megabytes / compress_time, megabytes / decompress_time, restored == data))
+    return rows
+
+
+def shorten_tags(data):
+    """
+    Replace every closing tag with '</>'.
+    """
+    return _CLOSING_TAG.sub(b"</>", data)
+
+
+def expand_tag_chunks(chunks):
+    """
+    Give every '</>' of a tag-shortened document the name of the element
+    it closes, one chunk at a time.
+
+    Each chunk is cut after its last tag name that is known to be
+    complete; the part before the cut is expanded with the structural
+    index and written out, and only the rest is carried over. The stack
+    of open tags is the only other state kept between chunks, so the
+    work is linear and memory does not grow with the input.
+
+    Args:
+        chunks (iterable): Consecutive bytes pieces of the compressed document
+
+    Yields:
+        bytes: The decompressed document, one piece per chunk
+    """
+    open_tags = []
+    buffer = b''
+    chunks = iter(chunks)
+
+    final = False
+    while not final:
+        chunk = next(chunks, None)
+        final = chunk is None
+        if not final:
+            buffer += chunk
+            # A name ends at a space, '>' or line break, so a '<' past
+            # the last of those may still be cut
+            last = max(buffer.rfind(b' '), buffer.rfind(b'>'), buffer.rfind(b'\n'))
+            cut = buffer.find(b'<', last + 1)
+            if cut == -1:
+                cut = len(buffer)
+        else:
+            cut = len(buffer)
+        if cut:
+            yield b''.join(_expand(buffer[:cut], open_tags))
+            buffer = buffer[cut:]
+
+
+def _expand(data, open_tags):
+    # Pieces of the decompressed document, with every '</>' given its name
+    index = StructuralIndex(data)
+    tag_starts, tag_ends, nested = index.tag_spans()
+    result = []
+    written = 0
+
+    for start, end, nest in zip(tag_starts.tolist(), tag_ends.tolist(), nested.tolist()):
+        tag = data[start + 1:end]
+        if nest:
+            tag = tag.replace(b'<', b'')
+            if not tag:
+                continue
+        # Add opening tag to stack
+        if tag[:1] != b'/':
+            open_tags.append(tag)
+            continue
+        # If closing tag with no opening tag
+        if not open_tags:
+            raise Exception(f"Missing opening tag for {tag[1:].decode('utf-8')}")
+        # Replace closing tag with correct closing tag
+        result.append(data[written:start])
+        result.append(b'</' + open_tags.pop() + b'>')
+        # Skip the '>' after the name too, unless the name ran to the end of its line
+        written = end if tag.endswith(b'\n') else end + 1
+    result.append(data[written:])
+    return result
+
+
+register_codec("tags", shorten_tags, lambda data: b"".join(expand_tag_chunks((bytes(data),))),
+               "closing tags shortened to '</>'")
+register_codec("zlib", lambda data: zlib.compress(data, 6), zlib.decompress, "zlib (deflate), level 6")
+register_codec("bz2", bz2.compress, bz2.decompress, "bzip2")
+register_codec("lzma", lzma.compress, lzma.decompress, "LZMA (xz container)")
+register_codec("containers", xml_containers.encode, lambda data: b"".join(xml_containers.decode(data)),
+               "structure and per-path text containers, each zlib-compressed")
+register_codec("bpe", lambda data: b"".join(bpe.encode(data)), lambda data: b"".join(bpe.decode(io.BytesIO(data))),
+               "byte pair encoding into the byte values the file does not use")
+register_codec("huffman", lambda data: b"".join(huffman.encode(data)), lambda data: b"".join(huffman.decode(data)),
+               "Huffman coding of single bytes")
+register_codec("blocks", lambda data: b"".join(xml_blocks.encode(data)),
+               lambda data: b"".join(xml_blocks.decode(io.BytesIO(data))),
+               "indexed zlib blocks of whole elements, for random access")
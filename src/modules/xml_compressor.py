@@ -1,9 +1,83 @@
 import re
+
+from src.modules import bpe, huffman, xml_blocks, xml_codecs, xml_containers, xml_dictionary
+from src.utils.file_utils import map_file, normalize_newlines
+
+# Bytes of the mapped input rewritten at a time
+MAPPED_CHUNK_SIZE = 1 << 20
+
+# Compression methods with a file format of their own. Any other codec
+# chain of the registry (e.g. "tags+lzma") is written in the codec format.
+TAGS = "tags"              # Closing tags shortened to '</>', output stays XML-like text
+CONTAINERS = "containers"  # Structure and per-path text containers, each zlib-compressed
+BPE = "bpe"                # Byte pair encoding into the byte values the file does not use
+BLOCKS = "blocks"          # Independently compressed blocks of whole elements, indexed for random access
+METHODS = (TAGS, CONTAINERS, BPE, BLOCKS)
+
+
 class XMLCompressor:
-    def __init__(self, input_path):
+    def __init__(self, input_path, use_mmap=False, method=TAGS, huffman=False, workers=1,
+                 block_size=xml_blocks.BLOCK_SIZE, dictionary=None):
         self.input_path = input_path
+        # Read through a shared read-only memory mapping instead of a private copy
+        self.use_mmap = use_mmap
+        if method not in METHODS:
+            # Raises ValueError for a name that is not registered
+            xml_codecs.get_chain(method)
+        self.method = method
+        # Huffman code the tag-shortened text instead of writing it as it is
+        if huffman and method != TAGS:
+            raise ValueError("The Huffman stage applies to the tags method only")
+        self.huffman = huffman
+        # Blocks are compressed in a pool of this many processes
+        if workers > 1 and method != BLOCKS:
+            raise ValueError("Parallel compression applies to the blocks method only")
+        self.workers = workers
+        # Bytes of document per block, and the path of a dictionary trained
+        # with train_dictionary() to prime every block with
+        if dictionary and method != BLOCKS:
+            raise ValueError("Dictionaries apply to the blocks method only")
+        self.block_size = block_size
+        self.dictionary = dictionary
+
+    @staticmethod
+    def train_dictionary(sample_paths, output_path, size=xml_dictionary.DICTIONARY_SIZE):
+        """
+        Train a compression dictionary on sample files and save it, to be
+        reused for any number of files of the same kind with the blocks method.
+
+        Args:
+            sample_paths (list): Paths of typical XML documents
+            output_path (str): Where the dictionary is written
+            size (int): Size of the dictionary in bytes
+        """
+        samples = []
+        for path in sample_paths:
+            with open(path, 'rb') as file:
+                samples.append(normalize_newlines(file.read()))
+        xml_dictionary.save(xml_dictionary.train(samples, size), output_path)
 
     def compress(self, output_path):
+        if self.huffman:
+            self._compress_huffman(output_path)
+            return
+        if self.method == CONTAINERS:
+            self._compress_containers(output_path)
+            return
+        if self.method == BPE:
+            self._compress_bpe(output_path)
+            return
+        if self.method == BLOCKS:
+            self._compress_blocks(output_path)
+            return
+        if self.method != TAGS:
+            self._compress_codecs(output_path)
+            return
+
+        if self.use_mmap:
+            self._compress_mapped(output_path)
+            return
+
         with open(self.input_path, 'r', encoding='utf-8') as file:
             data = file.read()
 
@@ -12,7 +86,77 @@ class XMLCompressor:
         with open(output_path, 'w', encoding='utf-8') as file:
             file.write(compressed_data)
 
+    def _compress_mapped(self, output_path):
+        # A closing tag never contains '>', so cutting the input right after a
+        # '>' never splits one and each piece can be rewritten on its own
+        with map_file(self.input_path) as data, open(output_path, 'wb') as file:
+            data = normalize_newlines(data)
+            start = 0
+            while start < len(data):
+                end = data.find(b'>', start + MAPPED_CHUNK_SIZE) + 1 or len(data)
+                file.write(xml_codecs.shorten_tags(data[start:end]))
+                start = end
+
+    def _compress_huffman(self, output_path):
+        # The code table needs the counts of the whole shortened text, so it
+        # is built in memory first
+        if self.use_mmap:
+            with map_file(self.input_path) as data:
+                shortened = xml_codecs.shorten_tags(normalize_newlines(data))
+        else:
+            with open(self.input_path, 'rb') as file:
+                shortened = xml_codecs.shorten_tags(normalize_newlines(file.read()))
+
+        with open(output_path, 'wb') as file:
+            file.writelines(huffman.encode(shortened))
+
+    def _compress_containers(self, output_path):
+        # Line breaks are normalized the same way as in text mode reading
+        if self.use_mmap:
+            with map_file(self.input_path) as data:
+                compressed_data = xml_containers.encode(normalize_newlines(data))
+        else:
+            with open(self.input_path, 'rb') as file:
+                compressed_data = xml_containers.encode(normalize_newlines(file.read()))
+
+        with open(output_path, 'wb') as file:
+            file.write(compressed_data)
+
+    def _compress_blocks(self, output_path):
+        # Blocks are written as they are compressed, the index comes last
+        dictionary = xml_dictionary.load(self.dictionary) if self.dictionary else None
+        if self.use_mmap:
+            with map_file(self.input_path) as data, open(output_path, 'wb') as file:
+                file.writelines(xml_blocks.encode(normalize_newlines(data), self.block_size,
+                                                  workers=self.workers, dictionary=dictionary))
+        else:
+            with open(self.input_path, 'rb') as file:
+                data = normalize_newlines(file.read())
+            with open(output_path, 'wb') as file:
+                file.writelines(xml_blocks.encode(data, self.block_size, workers=self.workers, dictionary=dictionary))
+
+    def _compress_bpe(self, output_path):
+        if self.use_mmap:
+            with map_file(self.input_path) as data, open(output_path, 'wb') as file:
+                file.writelines(bpe.encode(normalize_newlines(data)))
+        else:
+            with open(self.input_path, 'rb') as file:
+                data = normalize_newlines(file.read())
+            with open(output_path, 'wb') as file:
+                file.writelines(bpe.encode(data))
+
+    def _compress_codecs(self, output_path):
+        # Codecs of the registry work on the whole document at once
+        if self.use_mmap:
+            with map_file(self.input_path) as data:
+                compressed_data = xml_codecs.encode(normalize_newlines(data), self.method)
+        else:
+            with open(self.input_path, 'rb') as file:
+                compressed_data = xml_codecs.encode(normalize_newlines(file.read()), self.method)
+
+        with open(output_path, 'wb') as file:
+            file.write(compressed_data)
+
 # Usage
 # compressor = XMLCompressor('../../samples/large_sample.xml')
 # compressor.compress('../../samples/output.compressed')
-
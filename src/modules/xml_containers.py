@@ -0,0 +1,268 @@
+import json
+import re
+import struct
+import sys
+import zlib
+from array import array
+
+# First bytes of every container file
+MAGIC = b"XMC\x01"
+
+# Codes of the structure stream. Every element name gets two codes after
+# these, one for a bare start tag and one for a start tag with attributes.
+_END = 0
+_TEXT = 1
+_MISC = 2
+_FIRST_TAG = 3
+
+# Kinds of text containers
+_TEXT_KIND = 0
+_ATTRIBUTES_KIND = 1
+_MISC_KIND = 2
+
+# A tag runs from a '<' to the next '>' with no other '<' in between, and
+# everything else in the document is text. Groups: '/' of a closing tag,
+# element name, rest of the tag (attributes, '/'), text after the tag.
+_MARKUP = re.compile(rb"<(/?)([^\s/<>]*)([^<>]*)>([^<]*)")
+
+# Input scanned between two flushes of the containers
+_SLICE_SIZE = 1 << 20
+# Paths past this many share one container per kind, which bounds the
+# memory taken by the zlib compressors on documents with many paths
+_MAX_CONTAINERS = 256
+# Decoded pieces joined into one block of output
+_OUTPUT_PIECES = 1 << 16
+
+
+def is_container(data):
+    """
+    Tell whether data (the start of a file is enough) is in the container format.
+    """
+    return bytes(data[:len(MAGIC)]) == MAGIC
+
+
+class _Container:
+    # One stream of items (texts of one path, attributes, ...) compressed on its own
+
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level)
+        self.pending = []
+        self.output = []
+
+    def flush(self):
+        if self.pending:
+            # Items end with a NUL byte, which XML documents cannot contain
+            self.output.append(self.compressor.compress(b"\0".join(self.pending) + b"\0"))
+            # Cleared in place: the encoder holds on to the list
+            self.pending.clear()
+
+    def finish(self):
+        self.flush()
+        self.output.append(self.compressor.flush())
+        return b"".join(self.output)
+
+
+def _slices(data):
+    # Pieces of about _SLICE_SIZE bytes, each cut right before a '<' so that
+    # no tag is split between two of them
+    start = 0
+    while start < len(data):
+        end = data.find(b"<", start + _SLICE_SIZE)
+        if end == -1:
+            end = len(data)
+        yield data[start:end]
+        start = end
+
+
+def encode(data, level=6):
+    """
+    Compress an XML document in the spirit of XMill: the tree structure and
+    the text are separated, and the text is grouped by the path of the
+    element it belongs to (all <id> values of users together, all post
+    bodies together, ...), so that each group compresses with zlib far
+    better than the interleaved document does.
+
+    The file holds a JSON header (element names, container list and section
+    sizes) and then the compressed sections: the structure stream, a list of
+    element-name codes, text and end-of-element markers, followed by one
+    section per container. Decoding gives back the exact input bytes.
+
+    Args:
+        data (bytes-like): UTF-8 XML document
+        level (int): zlib compression level
+
+    Returns:
+        bytes: Content of the container file
+    """
+    if data.find(b"\0") != -1:
+        raise ValueError("XML documents cannot contain NUL characters")
+
+    names = {}
+    containers = {}
+    structure = array("I")
+    emit = structure.append
+
+    def container(kind, path):
+        found = containers.get((kind, path))
+        if found is None:
+            if len(containers) >= _MAX_CONTAINERS:
+                path = None
+                found = containers.get((kind, path))
+            if found is None:
+                found = containers[kind, path] = _Container(level)
+        return found.pending
+
+    # Text list of every path seen so far, keyed by the path
+    texts = {}
+    open_names = []
+    paths = [b""]
+    text = texts[b""] = container(_TEXT_KIND, b"")
+    stack = [text]
+
+    for piece in _slices(data):
+        pos = 0
+        for match in _MARKUP.finditer(piece):
+            start = match.start()
+            if start != pos:
+                # Text after a stray '<'
+                emit(_TEXT)
+                text.append(piece[pos:start])
+            pos = match.end()
+            close, name, rest, following = match.groups()
+
+            if close and not rest and open_names and name == open_names[-1]:
+                emit(_END)
+                open_names.pop()
+                paths.pop()
+                stack.pop()
+                text = stack[-1]
+            elif close or not name or name[:1] in b"?!":
+                # Declarations, comments and stray closing tags are kept as they are
+                emit(_MISC)
+                container(_MISC_KIND, b"").append(piece[start + 1:pos - len(following) - 1])
+            else:
+                code = names.get(name)
+                if code is None:
+                    code = names[name] = _FIRST_TAG + 2 * len(names)
+                path = paths[-1] + b"/" + name
+                if rest:
+                    emit(code + 1)
+                    container(_ATTRIBUTES_KIND, path).append(rest)
+                else:
+                    emit(code)
+                if rest[-1:] != b"/":
+                    open_names.append(name)
+                    paths.append(path)
+                    text = texts.get(path)
+                    if text is None:
+                        text = texts[path] = container(_TEXT_KIND, path)
+                    stack.append(text)
+
+            if following:
+                emit(_TEXT)
+                text.append(following)
+
+        if pos < len(piece):
+            emit(_TEXT)
+            text.append(piece[pos:])
+        for found in containers.values():
+            found.flush()
+
+    width = "H" if not structure or max(structure) < 1 << 16 else "I"
+    structure = array(width, structure)
+    if sys.byteorder == "big":
+        structure.byteswap()
+
+    keys = [key for key, found in containers.items() if found.output]
+    sections = [zlib.compress(structure.tobytes(), level)]
+    sections.extend(containers[key].finish() for key in keys)
+    header = json.dumps({
+        "width": width,
+        "names": [name.decode("utf-8", "surrogateescape") for name in names],
+        "containers": [[kind, path if path is None else path.decode("utf-8", "surrogateescape")]
+                       for kind, path in keys],
+        "sizes": [len(section) for section in sections],
+    }).encode("utf-8")
+    return b"".join([MAGIC, struct.pack("<I", len(header)), header] + sections)
+
+
+def decode(data):
+    """
+    Rebuild the XML document from the content of a container file.
+
+    Args:
+        data (bytes-like): Content written by encode()
+
+    Yields:
+        bytes: Consecutive blocks of the document
+    """
+    if not is_container(data):
+        raise ValueError("Not a container file")
+    offset = len(MAGIC) + 4
+    (header_size,) = struct.unpack_from("<I", data, len(MAGIC))
+    header = json.loads(bytes(data[offset:offset + header_size]))
+    offset += header_size
+
+    sections = []
+    for size in header["sizes"]:
+        sections.append(zlib.decompress(data[offset:offset + size]))
+        offset += size
+
+    structure = array(header["width"])
+    structure.frombytes(sections[0])
+    if sys.byteorder == "big":
+        structure.byteswap()
+    names = [name.encode("utf-8", "surrogateescape") for name in header["names"]]
+
+    streams = {}
+    for (kind, path), section in zip(header["containers"], sections[1:]):
+        if path is not None:
+            path = path.encode("utf-8", "surrogateescape")
+        # The empty piece after the last NUL is never asked for
+        streams[kind, path] = iter(section.split(b"\0"))
+    empty = iter(())
+
+    def stream(kind, path):
+        # Paths without a container of their own share the overflow one
+        found = streams.get((kind, path))
+        return found if found is not None else streams.get((kind, None), empty)
+
+    misc = stream(_MISC_KIND, b"")
+    texts = {b"": stream(_TEXT_KIND, b"")}
+
+    result = []
+    append = result.append
+    stack = []
+    path = b""
+    text = texts[b""]
+
+    for code in structure:
+        if code == _TEXT:
+            append(next(text))
+        elif code == _END:
+            name, path, text = stack.pop()
+            append(b"</" + name + b">")
+        elif code == _MISC:
+            append(b"<" + next(misc) + b">")
+        else:
+            name = names[(code - _FIRST_TAG) >> 1]
+            child = path + b"/" + name
+            if (code - _FIRST_TAG) & 1:
+                rest = next(stream(_ATTRIBUTES_KIND, child))
+                append(b"<" + name + rest + b">")
+                if rest[-1:] == b"/":
+                    continue
+            else:
+                append(b"<" + name + b">")
+            stack.append((name, path, text))
+            path = child
+            text = texts.get(child)
+            if text is None:
+                text = texts[child] = stream(_TEXT_KIND, child)
+
+        if len(result) >= _OUTPUT_PIECES:
+            yield b"".join(result)
+            result.clear()
+
+    if result:
+        yield b"".join(result)
@@ -1,6 +1,24 @@
+import codecs
+
+from src.modules import bpe, huffman, xml_blocks, xml_codecs, xml_containers, xml_dictionary
+from src.utils.file_utils import iter_byte_chunks, map_file, normalize_chunks
+
+# Default number of bytes read at a time
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
 class XMLDecompressor:
-    def __init__(self, input_path):
+    def __init__(self, input_path, use_mmap=False, chunk_size=DEFAULT_CHUNK_SIZE, workers=1, dictionary=None):
         self.input_path = input_path
+        # Read through a shared read-only memory mapping instead of a private copy
+        self.use_mmap = use_mmap
+        # The input is read and expanded this many bytes at a time
+        self.chunk_size = chunk_size
+        # Blocks of a file written with the blocks method are decompressed
+        # in a pool of this many processes
+        self.workers = workers
+        # Path of the dictionary a block file was compressed with
+        self.dictionary = dictionary
 
     def extract_tag(self, line, start):
         # Extract tag from line
@@ -16,32 +34,110 @@ class XMLDecompressor:
         return tag
 
     def decompress(self, output_path):
-        with open(self.input_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-            open_tags = []
-
-            for i, line in enumerate(lines):
-                for j, char in enumerate(line):
-                    if char == '<':
-                        tag = self.extract_tag(line, j)
-                        
-                        if tag == -1:
-                            continue
-                        # Add opening tag to stack
-                        if tag[0] != '/':
-                            open_tags.append(tag)
-                        else:
-                            # If closing tag with no opening tag
-                            if not open_tags:
-                                raise Exception(f"Missing opening tag for {tag[1:]}")
-                            else:
-                                # Replace closing tag with correct closing tag
-                                tag_name = open_tags.pop()
-                                lines[i] = lines[i][:j] + f'</{tag_name}>' + lines[i][j + len(tag) + 2:]
-                                
-        # Write decompressed data to output file
+        # Files written with the containers, bpe and blocks methods, with
+        # the Huffman stage or through the codec registry are told apart by
+        # their first bytes
+        with open(self.input_path, 'rb') as file:
+            magic = file.read(len(bpe.MAGIC))
+        if xml_containers.is_container(magic):
+            self._decompress_containers(output_path)
+            return
+        if xml_blocks.is_block_file(magic):
+            with open(self.input_path, 'rb') as file, open(output_path, 'wb') as output:
+                output.writelines(xml_blocks.decode(file, self.workers, self._load_dictionary()))
+            return
+        if magic == bpe.MAGIC:
+            with open(self.input_path, 'rb') as file, open(output_path, 'wb') as output:
+                output.writelines(bpe.decode(file, self.chunk_size))
+            return
+        if xml_codecs.is_codec_file(magic):
+            with open(self.input_path, 'rb') as file:
+                data = file.read()
+            with open(output_path, 'wb') as file:
+                file.write(xml_codecs.decode(data))
+            return
+
+        if magic == huffman.MAGIC:
+            # Tag-shortened text, whose line breaks were normalized before coding
+            with open(self.input_path, 'rb') as file:
+                chunks = huffman.decode(file.read())
+        else:
+            # Same line breaks as reading the file in text mode
+            chunks = normalize_chunks(iter_byte_chunks(self.input_path, self.chunk_size, self.use_mmap))
+
+        # Write decompressed data to output file as it is expanded
+        decoder = codecs.getincrementaldecoder('utf-8')()
         with open(output_path, 'w', encoding='utf-8') as file:
-            file.writelines(lines)
+            for block in self.expand_chunks(chunks):
+                file.write(decoder.decode(block))
+            file.write(decoder.decode(b'', final=True))
+
+    def extract(self, start, stop=None):
+        """
+        Extract children of the root element from a file written with the
+        blocks method, without decompressing the rest of it: only the blocks
+        holding the requested elements are read.
+
+        Args:
+            start (int): Position of the first element among the children of the root
+            stop (int): Position after the last one (start + 1 by default)
+
+        Returns:
+            list: The elements as str, in document order
+
+        Raises:
+            IndexError: If a position is negative or past the last element
+        """
+        if stop is None:
+            stop = start + 1
+        with open(self.input_path, 'rb') as file:
+            index = xml_blocks.BlockIndex(file, self._load_dictionary())
+            return [element.decode('utf-8') for element in index.elements(start, stop)]
+
+    def extract_by_id(self, element_id):
+        """
+        Extract the child of the root whose first <id> is element_id from a
+        file written with the blocks method.
+
+        Args:
+            element_id (str): Text of the element's <id>
+
+        Returns:
+            str | None: The element, or None if no element has that id
+        """
+        with open(self.input_path, 'rb') as file:
+            index = xml_blocks.BlockIndex(file, self._load_dictionary())
+            ordinal = index.ordinal(element_id)
+            if ordinal is None:
+                return None
+            return next(index.elements(ordinal, ordinal + 1)).decode('utf-8')
+
+    def _load_dictionary(self):
+        return xml_dictionary.load(self.dictionary) if self.dictionary else None
+
+    def expand_chunks(self, chunks):
+        """
+        Give every '</>' of a tag-shortened document the name of the element
+        it closes, one chunk at a time (see xml_codecs.expand_tag_chunks).
+
+        Args:
+            chunks (iterable): Consecutive bytes pieces of the compressed document
+
+        Yields:
+            bytes: The decompressed document, one piece per chunk
+        """
+        return xml_codecs.expand_tag_chunks(chunks)
+
+    def _decompress_containers(self, output_path):
+        # The document is written block by block as it is rebuilt
+        if self.use_mmap:
+            with map_file(self.input_path) as data, open(output_path, 'wb') as file:
+                file.writelines(xml_containers.decode(data))
+        else:
+            with open(self.input_path, 'rb') as file:
+                data = file.read()
+            with open(output_path, 'wb') as file:
+                file.writelines(xml_containers.decode(data))
 
 
 
@@ -0,0 +1,103 @@
+import zlib
+
+import numpy as np
+
+# First bytes of a saved dictionary
+MAGIC = b"XDC\x01"
+# zlib only looks back this far, so a longer preset dictionary is not used
+DICTIONARY_SIZE = 32 << 10
+# The dictionary is made of segments of this many bytes taken from the samples
+SEGMENT_SIZE = 1 << 10
+# Length of the substrings whose frequency decides which segments are taken
+KMER_SIZE = 8
+# Bytes of sample corpus trained on, taken in pieces spread over the files
+TRAINING_SIZE = 4 << 20
+_TRAINING_PIECES = 64
+
+
+def _training_data(samples, size=TRAINING_SIZE):
+    # The samples, or evenly spread pieces of them when they are too large
+    total = sum(len(sample) for sample in samples)
+    if total <= size:
+        return b"".join(bytes(sample) for sample in samples)
+    pieces = []
+    for sample in samples:
+        share = size * len(sample) // total
+        count = max(1, _TRAINING_PIECES * len(sample) // total)
+        piece = share // count
+        step = (len(sample) - piece) // max(count - 1, 1)
+        pieces.extend(sample[k * step:k * step + piece] for k in range(count))
+    return b"".join(pieces)
+
+
+def train(samples, size=DICTIONARY_SIZE):
+    """
+    Train a zlib preset dictionary on a sample corpus.
+
+    This follows the COVER algorithm of zstd's dictionary builder. Every
+    KMER_SIZE-byte substring of the corpus is counted with NumPy, and the
+    corpus is split into one epoch per segment of the dictionary. From each
+    epoch, the SEGMENT_SIZE-byte window with the highest total count of
+    substrings is taken. The substrings it covers then count for nothing, so
+    later segments bring in tag sequences and words not seen yet.
+
+    Args:
+        samples (list): bytes-like documents typical of those to be compressed
+        size (int): Size of the dictionary
+
+    Returns:
+        bytes: The dictionary
+    """
+    data = _training_data(samples)
+    if len(data) <= size:
+        return data
+    array = np.frombuffer(data, dtype=np.uint8)
+    windows = np.lib.stride_tricks.sliding_window_view(array, KMER_SIZE)
+    kmers = np.zeros(len(windows), dtype=np.uint64)
+    for k in range(KMER_SIZE):
+        kmers = (kmers << np.uint64(8)) | windows[:, k].astype(np.uint64)
+    _, inverse, counts = np.unique(kmers, return_inverse=True, return_counts=True)
+    scores = counts.astype(np.float64)
+
+    segment = min(SEGMENT_SIZE, size)
+    segments = max(size // segment, 1)
+    epoch = len(kmers) // segments
+    chosen = []
+    for k in range(segments):
+        start, end = k * epoch, min((k + 1) * epoch, len(kmers))
+        if end - start < segment:
+            break
+        totals = np.concatenate(([0], np.cumsum(scores[inverse[start:end]])))
+        best = start + int(np.argmax(totals[segment:] - totals[:-segment]))
+        chosen.append(data[best:best + segment])
+        scores[inverse[best:best + segment]] = 0
+    return b"".join(chosen)[-size:]
+
+
+def dictionary_id(dictionary):
+    """
+    Checksum identifying a dictionary, stored in the files compressed with it.
+    """
+    return zlib.crc32(dictionary)
+
+
+def save(dictionary, path):
+    """
+    Write a dictionary to disk.
+    """
+    with open(path, "wb") as file:
+        file.write(MAGIC + dictionary)
+
+
+def load(path):
+    """
+    Read a dictionary written by save().
+
+    Returns:
+        bytes: The dictionary
+    """
+    with open(path, "rb") as file:
+        content = file.read()
+    if content[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a compression dictionary")
+    return content[len(MAGIC):]
@@ -1,6 +1,175 @@
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from src.modules.xml_tokenizer import XMLTokenizer, OPEN_TAG
+from src.utils.file_utils import iter_text_chunks, iter_byte_chunks
+
+# Default number of characters read at a time
+DEFAULT_CHUNK_SIZE = 1 << 20
+# Largest byte range handed to a single worker in parallel mode
+PARTITION_SIZE = 16 << 20
+# Bytes read from the start of the file to find the root's first child
+_PROLOG_SIZE = 64 << 10
+
+
+class _Markup:
+    # The characters the formatter splits and indents on, as str or as bytes
+    def __init__(self, convert):
+        self.empty = convert("")
+        self.space = convert(" ")
+        self.newline = convert("\n")
+        self.carriage_return = convert("\r")
+        self.lt = convert("<")
+        self.gt = convert(">")
+        self.lt_newline = convert("\n<")
+        self.gt_newline = convert(">\n")
+        self.bang = convert("<!")
+        self.question = convert("<?")
+        self.slash = convert("</")
+        self.comment_start = convert("<!--")
+        self.empty_tag_end = convert("/>")
+
+
+_TEXT_MARKUP = _Markup(str)
+_BYTES_MARKUP = _Markup(lambda text: text.encode("ascii"))
+
+
+def _read_range(file_path, start, end, binary=False):
+    # Decode a byte range the same way open(file_path, 'r', encoding='utf-8') would
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        raw = file.read(end - start)
+    if binary:
+        return raw
+    return io.TextIOWrapper(io.BytesIO(raw), encoding='utf-8').read()
+
+
+def _format_partition(file_path, start, end, indent, count, binary=False):
+    """
+    Format the byte range [start, end) of a file, starting at the given
+    indentation level.
+
+    Returns:
+        tuple: (text, indent) with the formatted lines joined by newlines and
+        the indentation level after the last of them.
+    """
+    formatter = XMLFormatter(file_path, binary=binary)
+    markup = formatter._markup
+    pretty_lines = []
+    for pieces in formatter._iter_pieces((_read_range(file_path, start, end, binary),)):
+        indent = formatter._format_pieces(pieces, markup.space * count, indent, pretty_lines)
+    return markup.newline.join(pretty_lines), indent
+
+
+def _first_child(file_path):
+    # Name of the first element nested in the root, found near the start of the file
+    with open(file_path, 'rb') as file:
+        prolog = file.read(_PROLOG_SIZE).decode('utf-8', errors='ignore')
+    opens = (name for kind, name, _, _ in XMLTokenizer().tokenize(prolog) if kind == OPEN_TAG)
+    next(opens, None)
+    child = next(opens, None)
+    return child.rstrip("\n") if child else None
+
+
+def _partition_bounds(file_path, partitions, child):
+    """
+    Split a file into about `partitions` byte ranges, each one but the first
+    starting at an opening <child> tag.
+    """
+    size = os.path.getsize(file_path)
+    marker = b"<" + child.encode('utf-8')
+    bounds = [0]
+    with open(file_path, 'rb') as file:
+        for k in range(1, partitions):
+            pos = max(size * k // partitions, bounds[-1] + 1)
+            found = -1
+            while found == -1 and pos < size:
+                file.seek(pos)
+                block = file.read(1 << 16)
+                found = block.find(marker)
+                # The tag name must end right after the marker
+                while found != -1 and block[found + len(marker):found + len(marker) + 1] not in b" >/\t\r\n":
+                    found = block.find(marker, found + 1)
+                if found == -1:
+                    pos += max(len(block) - len(marker), 1)
+            if found == -1:
+                break
+            bounds.append(pos + found)
+    bounds.append(size)
+    return bounds
+
+
 class XMLFormatter:
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, use_mmap: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 workers: int = 1, binary: bool = False):
         self.file_path: str = file_path
+        # Decode the input straight from a read-only memory mapping
+        self.use_mmap: bool = use_mmap
+        # The input is read and formatted this many characters at a time
+        self.chunk_size: int = chunk_size
+        # Parallel mode formats the root's children in a process pool
+        self.workers: int = workers
+        # Bytes mode formats the raw bytes without decoding them
+        self.binary: bool = binary
+        self._markup = _BYTES_MARKUP if binary else _TEXT_MARKUP
+
+    def _split(self, text):
+        # A line break goes before every '<' and after every '>'
+        m = self._markup
+        return text.replace(m.lt, m.lt_newline).replace(m.gt, m.gt_newline).split(m.newline)
+
+    def _iter_pieces(self, chunks):
+        """
+        Split the document into the pieces that become output lines.
+        Yields one list of pieces per chunk; a piece cut by a chunk boundary
+        is carried over to the next chunk.
+        """
+        m = self._markup
+        carry = m.empty
+        for chunk in chunks:
+            # Raw bytes keep their '\r' line breaks, which text mode translates
+            if self.binary and m.carriage_return in chunk:
+                chunk = chunk.replace(m.carriage_return, m.empty)
+            buffer = carry + chunk.replace(m.newline, m.empty)
+            # Everything up to the last '<' (or past the last '>') is complete
+            cut = max(buffer.rfind(m.lt), buffer.rfind(m.gt) + 1, 0)
+            if cut:
+                yield self._split(buffer[:cut])
+            carry = buffer[cut:]
+        if carry:
+            yield self._split(carry)
+
+    def _format_pieces(self, pieces, indent_str, indent, pretty_lines):
+        """
+        Append the indented lines for pieces to pretty_lines.
+        Returns the indentation level after the last piece.
+        """
+        m = self._markup
+        append = pretty_lines.append
+        for line in pieces:
+            line = line.strip()
+            if not line:
+                continue
+            if line[:1] == m.lt:
+                start = line[:2]
+                if start == m.bang and line.startswith(m.comment_start):
+                    continue
+                elif start == m.question:
+                    append(line)
+                    continue
+                elif start == m.slash:
+                    indent -= 1
+                    append(indent_str * indent + line)
+                else:
+                    append(indent_str * indent + line)
+                    indent += 1
+            else:
+                append(indent_str * indent + line)
+            if line.endswith(m.empty_tag_end):
+                indent -= 1
+        return indent
 
     def prettify(self, output_path: str, count: int = 4) -> None | str:
         """
@@ -8,47 +177,96 @@ class XMLFormatter:
         The count parameter is optional and is used to specify the number of spaces to use for indentation.
         It returns None if the file is successfully written to the output file.
         If the input file is not found, it returns a string indicating the file is not found.
+
+        The input is read in chunks and the lines are written out as they are
+        formatted, so memory use does not grow with the size of the file.
+        With workers > 1 the file is split before children of the root element
+        and the parts are formatted in a process pool; the output is the same.
+        In bytes mode the file is never decoded and text is copied byte for
+        byte; only ASCII whitespace is trimmed from the lines.
         """
+        m = self._markup
+        if self.workers > 1 and os.path.isfile(self.file_path):
+            try:
+                with self._open_output(output_path) as f:
+                    self._prettify_parallel(f, count)
+                return
+            except Exception as e:
+                raise Exception(f"An error occurred: {e}")
+
         try:
-            with open(self.file_path, "r") as f:
-                xml_file = f.read()
+            if self.binary:
+                chunks = iter_byte_chunks(self.file_path, self.chunk_size, self.use_mmap)
+            else:
+                chunks = iter_text_chunks(self.file_path, self.chunk_size, self.use_mmap, encoding="utf-8")
         except FileNotFoundError:
             return f"{self.file_path} is not Found"
         except Exception as e:
             raise Exception(f"An error occurred: {e}")
-        lines = (
-            xml_file.replace("\n", "")
-            .replace("<", "\n<")
-            .replace(">", ">\n")
-            .split("\n")
-        )
 
         indent = 0
-        indent_str = " " * count
-        pretty_lines = []
-        for line in lines:
-            line = line.strip()
-            if line == "" or line.startswith("<!--"):
-                continue
-            elif line.startswith("<?"):
-                pretty_lines.append(line)
-                continue
-            elif line.startswith("</"):
-                indent -= 1
-
-            pretty_lines.append(indent_str * indent + line)
-            if line.startswith("<") and not line.startswith("</"):
-                indent += 1
-            if line.endswith("/>"):
-                indent -= 1
-
-        pretty_xml = "\n".join(pretty_lines)
+        indent_str = m.space * count
+        separator = m.empty
         try:
-            with open(output_path, "w", encoding="utf-8") as f:
-                xml_file = f.write(pretty_xml)
+            with self._open_output(output_path) as f:
+                for pieces in self._iter_pieces(chunks):
+                    pretty_lines = []
+                    indent = self._format_pieces(pieces, indent_str, indent, pretty_lines)
+                    if pretty_lines:
+                        f.write(separator)
+                        f.write(m.newline.join(pretty_lines))
+                        separator = m.newline
         except Exception as e:
             raise Exception(f"An error occurred: {e}")
+        finally:
+            chunks.close()
+
+    def _open_output(self, output_path):
+        if self.binary:
+            return open(output_path, "wb")
+        return open(output_path, "w", encoding="utf-8")
+
+    def _prettify_parallel(self, output, count):
+        """
+        Format the file in partitions that start at children of the root.
+
+        Every partition but the first is formatted in a worker assuming it
+        starts one level deep, which holds for children of the root. The
+        partitions are written in order, and one whose actual starting level
+        turns out different (in a malformed file) is formatted again here.
+        """
+        child = _first_child(self.file_path)
+        partitions = max(self.workers, -(-os.path.getsize(self.file_path) // PARTITION_SIZE))
+        bounds = _partition_bounds(self.file_path, partitions, child) if child else [0, os.path.getsize(self.file_path)]
+        ranges = list(zip(bounds[:-1], bounds[1:]))
+
+        indent = 0
+        separator = self._markup.empty
+
+        def write(start, end, guess, future):
+            nonlocal indent, separator
+            text, after = future.result()
+            if guess != indent:
+                text, after = _format_partition(self.file_path, start, end, indent, count, self.binary)
+            indent = after
+            if text:
+                output.write(separator)
+                output.write(text)
+                separator = self._markup.newline
 
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            # Keep a bounded number of partitions in flight so that finished
+            # results do not pile up in memory
+            pending = deque()
+            for k, (start, end) in enumerate(ranges):
+                guess = 0 if k == 0 else 1
+                future = executor.submit(_format_partition, self.file_path, start, end, guess, count,
+                                         self.binary)
+                pending.append((start, end, guess, future))
+                if len(pending) > 2 * self.workers:
+                    write(*pending.popleft())
+            while pending:
+                write(*pending.popleft())
 
 # xml_formatter = XMLFormatter("./samples/commented_sample.xml")
 # valid = xml_formatter.prettify("output.xml")
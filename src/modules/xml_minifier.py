@@ -1,88 +1,290 @@
+import itertools
+import re
+
+from src.modules.structural_index import StructuralIndex
+from src.utils.file_utils import iter_text_chunks, iter_byte_chunks
+
+# Default number of characters read at a time
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# States of the fused minifier
+_TEXT = 0
+_TAG = 1
+_COMMENT = 2
+
+
+class _Markup:
+    """
+    The markup the fused minifier looks for, as str or as bytes. All of it
+    is ASCII, so bytes mode works on any ASCII-compatible encoding.
+    """
+
+    def __init__(self, convert):
+        self.empty = convert("")
+        self.lt = convert("<")
+        self.gt = convert(">")
+        self.comment_start = convert("<!--")
+        self.comment_end = convert("-->")
+        # Whitespace after a tag and before the next one, for stretches of the
+        # document where every '<' starts a tag and every '>' ends one
+        self.space_after_tag = re.compile(convert(r">\s+"))
+        self.space_before_tag = re.compile(convert(r"\s+<"))
+        # A '>' in text: one that follows another '>' with no '<' in between
+        self.text_gt = re.compile(convert(r">[^<]*>"))
+
+
+_TEXT_MARKUP = _Markup(str)
+_BYTES_MARKUP = _Markup(lambda text: text.encode("ascii"))
+
+
 class XMLMinifier:
-    def __init__(self, file_path):
+    def __init__(self, file_path, use_mmap=False, chunk_size=DEFAULT_CHUNK_SIZE, binary=False):
         self.file_path = file_path
+        # Minify straight from a shared read-only memory mapping of the file
+        self.use_mmap = use_mmap
+        # The input is read and minified this many characters at a time
+        self.chunk_size = chunk_size
+        # Bytes mode minifies the raw bytes without decoding them
+        self.binary = binary
 
     def remove_comments(self, xml_content):
         """
         Removes all comments from the XML content.
         XML comments are of the format <!-- comment -->
+        The content may be str or bytes-like (returned as is when it has no comments).
         """
+        if isinstance(xml_content, str):
+            comment_start, comment_end, empty = "<!--", "-->", ""
+        else:
+            comment_start, comment_end, empty = b"<!--", b"-->", b""
         result = []
-        inside_comment = False
 
         i = 0
-        while i < len(xml_content):
-            if xml_content[i:i+4] == "<!--":
-                inside_comment = True
-                i += 4
-            elif inside_comment and xml_content[i:i+3] == "-->":
-                inside_comment = False
-                i += 3
-            elif not inside_comment:
-                result.append(xml_content[i])
-                i += 1
-            else:
-                i += 1
+        while True:
+            start = xml_content.find(comment_start, i)
+            if start == -1 and i == 0:
+                return xml_content
+            if start == -1:
+                result.append(xml_content[i:])
+                break
+            result.append(xml_content[i:start])
+
+            # Find the end of the comment, skipping over any "<!--" inside it
+            i = start + 4
+            while True:
+                end = xml_content.find(comment_end, i)
+                nested = xml_content.find(comment_start, i, end + 3 if end != -1 else len(xml_content))
+                if nested == -1:
+                    break
+                i = nested + 4
+            if end == -1:
+                break
+            i = end + 3
 
-        return ''.join(result)
+        return empty.join(result)
+
+    def _append_text(self, result, text):
+        # '>' characters outside tags are kept, the rest of the text is trimmed
+        if b">" in text:
+            result.append(b">" * text.count(b">"))
+            text = text.replace(b">", b"")
+        trimmed_text = text.decode('utf-8').strip()
+        if trimmed_text:
+            result.append(trimmed_text.encode('utf-8'))
 
     def clean_whitespace(self, xml_content):
         """
         Removes unnecessary whitespace (e.g., leading/trailing spaces, newlines).
         Retains meaningful spaces within text nodes.
+        Bytes-like content (UTF-8) gives bytes back, str gives str.
         """
-        result = []
-        inside_tag = False
-        buffer = []
+        as_text = isinstance(xml_content, str)
+        index = StructuralIndex(xml_content.encode('utf-8') if as_text else xml_content)
+        data = index.data
+        tag_starts = index.positions('<')
+        tag_ends = index.next_positions('>', tag_starts)
 
+        # Copy every tag as is and trim the text between tags
+        result = []
         i = 0
-        while i < len(xml_content):
-            char = xml_content[i]
-
-            if char == "<":
-                # If there's accumulated text, trim and add it to result
-                if buffer:
-                    trimmed_text = ''.join(buffer).strip()
-                    if trimmed_text:
-                        result.append(trimmed_text)
-                    buffer = []
-                inside_tag = True
-                result.append(char)
-            elif char == ">":
-                inside_tag = False
-                result.append(char)
-            elif inside_tag:
-                result.append(char)
-            else:
-                # Accumulate text content outside of tags
-                buffer.append(char)
+        for start, end in zip(tag_starts.tolist(), tag_ends.tolist()):
+            if start < i:
+                continue  # A '<' inside a tag that was already copied
+            self._append_text(result, data[i:start])
+            result.append(data[start:end + 1])
+            i = end + 1
+        self._append_text(result, data[i:])
 
-            i += 1
+        result = b''.join(result)
+        return result.decode('utf-8') if as_text else result
 
-        # Add any remaining text outside tags
-        if buffer:
-            trimmed_text = ''.join(buffer).strip()
-            if trimmed_text:
-                result.append(trimmed_text)
+    def _flush_text(self, text, result, markup):
+        # Same as _append_text, for a text node collected in pieces
+        text = markup.empty.join(text)
+        if markup.gt in text:
+            result.append(markup.gt * text.count(markup.gt))
+            text = text.replace(markup.gt, markup.empty)
+        text = text.strip()
+        if text:
+            result.append(text)
 
-        return ''.join(result)
+    def _fast_text(self, buffer, i, result, markup):
+        """
+        Minify buffer from i (at the start of a text node) up to the last tag
+        before the next comment, when that stretch has no '>' in text and no
+        '<' inside tags: the text nodes then only need their whitespace
+        trimmed, which two regular expression substitutions do.
+
+        Returns:
+            tuple: (position reached, end of the stretch that was tried)
+        """
+        lt, gt = markup.lt, markup.gt
+        limit = buffer.find(markup.comment_start, i)
+        if limit == -1:
+            limit = len(buffer)
+        # The stretch ends at a tag; one near the end of the buffer could
+        # still turn out to be a comment cut by the chunk boundary
+        end = buffer.rfind(lt, i, min(limit, len(buffer) - 3))
+        if end <= i:
+            return i, limit
+        stretch = buffer[i:end]
+        first = stretch.find(lt)
+        if (stretch.count(lt) != stretch.count(gt) or gt in stretch[:first]
+                or markup.text_gt.search(stretch)):
+            return i, limit
+        stretch = markup.space_after_tag.sub(gt, stretch.strip())
+        result.append(markup.space_before_tag.sub(lt, stretch))
+        return end, limit
+
+    def minify_chunks(self, chunks):
+        """
+        Remove comments and clean whitespace in a single pass over a document
+        that arrives in pieces.
+
+        The output is the same as clean_whitespace(remove_comments(...)) on the
+        whole document. The scanner jumps between '<', '>', '<!--' and '-->'
+        with str.find; the current state (inside text, a tag or a comment) and
+        any marker cut by a chunk boundary carry over to the next chunk. Only
+        the text node being trimmed is held back until it is complete.
+
+        Args:
+            chunks (iterable): Consecutive str pieces of the document, or
+                bytes pieces to minify without decoding
+
+        Yields:
+            str | bytes: Minified output, one piece per chunk
+        """
+        chunks = iter(chunks)
+        first = next(chunks, None)
+        if first is None:
+            return
+        markup = _TEXT_MARKUP if isinstance(first, str) else _BYTES_MARKUP
+        chunks = itertools.chain((first,), chunks)
+        lt, gt = markup.lt, markup.gt
+        comment_start, comment_end = markup.comment_start, markup.comment_end
+
+        state = _TEXT
+        resume = _TEXT  # State to return to after a comment
+        text = []       # Pieces of the current text node
+        buffer = markup.empty
+        checked = 0     # End of the stretch already tried with _fast_text
+
+        final = False
+        while not final:
+            chunk = next(chunks, None)
+            final = chunk is None
+            buffer = buffer + chunk if not final else buffer
+            size = len(buffer)
+            result = []
+            i = 0
+            checked = 0
+
+            while i < size:
+                if state == _TEXT and not text and i >= checked:
+                    # Minify everything up to the next comment in one go if possible
+                    i, checked = self._fast_text(buffer, i, result, markup)
+                    if i >= size:
+                        break
+
+                if state == _TEXT:
+                    start = buffer.find(lt, i)
+                    if start == -1:
+                        text.append(buffer[i:])
+                        i = size
+                        break
+                    text.append(buffer[i:start])
+                    i = start
+                    # Wait for more input if this could be a cut "<!--"
+                    if not final and size - i < 4 and comment_start.startswith(buffer[i:]):
+                        break
+                    if buffer.startswith(comment_start, i):
+                        state, resume = _COMMENT, _TEXT
+                        i += 4
+                        continue
+                    self._flush_text(text, result, markup)
+                    text = []
+                    result.append(lt)
+                    state = _TAG
+                    i += 1
+
+                elif state == _TAG:
+                    # Copy the tag up to its '>', minus any comments inside it
+                    end = buffer.find(gt, i)
+                    comment = buffer.find(comment_start, i, end if end != -1 else size)
+                    if comment != -1:
+                        result.append(buffer[i:comment])
+                        state, resume = _COMMENT, _TAG
+                        i = comment + 4
+                    elif end != -1:
+                        result.append(buffer[i:end + 1])
+                        state = _TEXT
+                        i = end + 1
+                    else:
+                        # Keep back a possible cut "<!--"
+                        keep = size if final else max(i, size - 3)
+                        result.append(buffer[i:keep])
+                        i = keep
+                        break
+
+                else:
+                    # Find the end of the comment, skipping over any "<!--" inside it
+                    end = buffer.find(comment_end, i)
+                    nested = buffer.find(comment_start, i, end + 3 if end != -1 else size)
+                    if nested != -1:
+                        i = nested + 4
+                    elif end != -1:
+                        state = resume
+                        i = end + 3
+                    else:
+                        # An unterminated comment runs to the end of the document
+                        i = size if final else max(i, size - 3)
+                        break
+
+            buffer = buffer[i:]
+            if final:
+                self._flush_text(text, result, markup)
+            if result:
+                yield markup.empty.join(result)
 
     def minify(self, output_path):
         """
         Minifies the XML file by removing comments and cleaning unnecessary whitespace.
+        In bytes mode the file is never decoded: text runs are copied byte for
+        byte, line breaks are kept as they are in the input, and only ASCII
+        whitespace is trimmed.
         """
         try:
-            # Read the XML content from the file
-            with open(self.file_path, 'r', encoding='utf-8') as file:
-                xml_content = file.read()
-
-            # Remove comments and clean whitespace
-            xml_content = self.remove_comments(xml_content)
-            xml_content = self.clean_whitespace(xml_content)
-
-            # Write the cleaned XML content to the output file
-            with open(output_path, 'w', encoding='utf-8') as file:
-                file.write(xml_content)
+            # Read the XML content in chunks, remove comments and clean
+            # whitespace in one pass, and write the output as it is produced
+            if self.binary:
+                chunks = iter_byte_chunks(self.file_path, self.chunk_size, self.use_mmap)
+                output = open(output_path, 'wb')
+            else:
+                chunks = iter_text_chunks(self.file_path, self.chunk_size, self.use_mmap, encoding='utf-8')
+                output = open(output_path, 'w', encoding='utf-8')
+            with output as file:
+                for piece in self.minify_chunks(chunks):
+                    file.write(piece)
 
             print(f"Minified XML written to {output_path}")
 
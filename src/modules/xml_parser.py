@@ -1,8 +1,124 @@
+import io
+import os
+from bisect import bisect_right
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+
+from src.modules.structural_index import StructuralIndex
+from src.modules.xml_tokenizer import XMLTokenizer, OPEN_TAG
+from src.utils.file_utils import map_file, read_text
+
+# Default number of characters read at a time in streaming mode
+DEFAULT_CHUNK_SIZE = 1 << 20
+# Largest byte range handed to a single worker in parallel mode
+SHARD_SIZE = 64 << 20
+
+# Kinds of problems reported by XMLParser
+MISSING_OPENING = "opening"
+MISSING_CLOSING = "closing"
+
+
+def _summarize(tags):
+    """
+    Reduce a run of tag events to the part that depends on its surroundings.
+
+    Every closing tag pops the most recent unmatched opening tag, whatever its
+    name, so the pairing inside a run never changes. What is left is the list
+    of closing tags that either mismatched locally or reach back before the
+    run, and the opening tags still unmatched at its end.
+
+    Returns:
+        tuple: (closes, opens) where closes holds (line, column, expected, tag)
+        in order of appearance, expected being None for a closing tag with
+        no opening tag inside the run.
+    """
+    closes = []
+    stack = []
+    for kind, tag, i, j in tags:
+        if kind == OPEN_TAG:
+            stack.append(tag)
+        elif not stack:
+            closes.append((i, j, None, tag))
+        else:
+            expected = stack.pop()
+            if expected != tag:
+                closes.append((i, j, expected, tag))
+    return closes, stack
+
+
+def _scan_shard(file_path, start, end):
+    """
+    Summarize the tags in the byte range [start, end) of a file.
+
+    Returns:
+        tuple: (closes, opens, newlines, tail) where newlines is the number of
+        lines the range ends and tail the characters after its last newline.
+    """
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        raw = file.read(end - start)
+    # Decode the same way open(file_path, 'r', encoding='utf-8') would
+    text = io.TextIOWrapper(io.BytesIO(raw), encoding='utf-8').read()
+
+    closes, opens = _summarize(XMLTokenizer().tokenize(text))
+    return closes, opens, text.count('\n'), len(text) - text.rfind('\n') - 1
+
+
+def _shard_bounds(file_path, shards):
+    """
+    Split a file into about `shards` byte ranges, each ending right after a '>'
+    so that no tag name is cut in two.
+    """
+    size = os.path.getsize(file_path)
+    bounds = [0]
+    with open(file_path, 'rb') as file:
+        for k in range(1, shards):
+            pos = max(size * k // shards, bounds[-1])
+            file.seek(pos)
+            while True:
+                block = file.read(1 << 16)
+                if not block:
+                    pos = size
+                    break
+                found = block.find(b'>')
+                if found != -1:
+                    pos += found + 1
+                    break
+                pos += len(block)
+            if pos >= size:
+                break
+            bounds.append(pos)
+    bounds.append(size)
+    return bounds
+
+
+def _describe(i, j, missing, tag):
+    # Build the (error, fix) pair reported for a problem
+    fix_column = j - 1 if i != -1 else -1
+    if missing == MISSING_OPENING:
+        return (i, j, "Missing opening tag for " + tag), (i, fix_column, "<" + tag + ">")
+    return (i, j, "Missing closing tag for " + tag), (i, fix_column, "</" + tag + ">")
+
+
 class XMLParser:
-    def __init__(self, file_path):
+    def __init__(self, file_path, stream=False, chunk_size=DEFAULT_CHUNK_SIZE, workers=1,
+                 checkpoint_interval=None, use_mmap=False):
         self.file_path = file_path
+        # Streaming mode reads the file in fixed-size chunks instead of whole
+        self.stream = stream
+        self.chunk_size = chunk_size
+        # Parallel mode splits the file into byte ranges scanned by a process pool
+        self.workers = workers
+        # Record tag stack snapshots every checkpoint_interval characters so
+        # that recheck() can re-verify an edited file without a full rescan
+        self.checkpoint_interval = checkpoint_interval
+        # Read through a shared read-only memory mapping instead of a private copy
+        self.use_mmap = use_mmap
+        self.checkpoints = []
         self.errors = []
         self.fixes = []
+        self.tokenizer = XMLTokenizer()
 
     def extract_tag(self, line, start):
         # Extract tag from line
@@ -17,65 +133,311 @@ class XMLParser:
             tag += char
         return tag
     
-    def check_consistency(self):
-        # Check XML for mismatched tags
-        self.errors = []
-        
-        with open(self.file_path, 'r') as file:
-            lines = file.readlines()
-            stack = []
-            for i, line in enumerate(lines):
-                for j, char in enumerate(line):
-                    if char == '<':
-                        tag = self.extract_tag(line, j)
-                        
-                        if tag == -1:
+    def _read_tags(self):
+        # Yield tag events for the whole file
+        if not self.stream and self.use_mmap:
+            with map_file(self.file_path) as data:
+                yield from self.tokenizer.tokenize_index(StructuralIndex(data))
+            return
+        if not self.stream:
+            yield from self.tokenizer.tokenize_index(StructuralIndex.from_file(self.file_path))
+            return
+        with open(self.file_path, 'r', encoding='utf-8') as file:
+            chunks = iter(lambda: file.read(self.chunk_size), '')
+            yield from self.tokenizer.tokenize_chunks(chunks)
+
+    def _scan_shards(self):
+        # Summarize byte ranges of the file in a process pool, in file order
+        shards = max(self.workers, -(-os.path.getsize(self.file_path) // SHARD_SIZE))
+        bounds = _shard_bounds(self.file_path, shards)
+        if len(bounds) <= 2:
+            yield _scan_shard(self.file_path, bounds[0], bounds[-1])
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            # Closing this generator early cancels the shards not started yet
+            yield from executor.map(_scan_shard, repeat(self.file_path), bounds[:-1], bounds[1:])
+
+    def _iter_problems(self):
+        """
+        Yield (line, column, missing, tag) for every problem in file order,
+        where missing is MISSING_OPENING or MISSING_CLOSING. Tags left open at
+        the end of the file come last with line and column set to -1.
+        """
+        stack = []
+        if self.checkpoint_interval:
+            self.checkpoints = []
+            text = read_text(self.file_path, self.use_mmap)
+            yield from self._scan_text(text, 0, 0, 0, stack, 0)
+        elif self.workers <= 1:
+            for kind, tag, i, j in self._read_tags():
+                # Add opening tag to stack
+                if kind == OPEN_TAG:
+                    stack.append(tag)
+                # If closing tag with no opening tag
+                elif not stack:
+                    yield i, j, MISSING_OPENING, tag
+                # If closing tag matches opening tag
+                elif stack[-1] == tag:
+                    stack.pop()
+                else:
+                    yield i, j, MISSING_CLOSING, stack.pop()
+                    yield i, j, MISSING_OPENING, tag
+        else:
+            # Merge the shard summaries left to right, carrying the stack over
+            line_offset = 0
+            column_offset = 0
+            for closes, opens, newlines, tail in self._scan_shards():
+                for i, j, expected, tag in closes:
+                    if i == 0:
+                        j += column_offset
+                    i += line_offset
+                    if expected is None:
+                        if not stack:
+                            yield i, j, MISSING_OPENING, tag
+                            continue
+                        expected = stack.pop()
+                        if expected == tag:
                             continue
-                        # Add opening tag to stack
-                        if tag[0] != '/':
-                            stack.append(tag)
-                        else:
-                            # If closing tag with no opening tag
-                            if not stack:
-                                self.errors.append((i, j, "Missing opening tag for " + tag[1:]))
-                                self.fixes.append((i, j - 1, "<" + tag[1:] + ">"))
-                            else:
-                                # If closing tag matches opening tag
-                                if stack[-1] == tag[1:]:
-                                    stack.pop()
-                                else:
-                                    self.errors.append((i, j, "Missing closing tag for " + stack[-1]))
-                                    self.errors.append((i, j, "Missing opening tag for " + tag[1:]))
-                                    self.fixes.append((i, j - 1, "</" + stack[-1] + ">"))
-                                    self.fixes.append((i, j - 1, "<" + tag[1:] + ">"))
-                                    stack.pop()
-        
+                    yield i, j, MISSING_CLOSING, expected
+                    yield i, j, MISSING_OPENING, tag
+                stack.extend(opens)
+
+                if newlines:
+                    line_offset += newlines
+                    column_offset = tail
+                else:
+                    column_offset += tail
+
         # Add errors for any remaining tags in stack
         for tag in stack:
-            self.errors.append((-1, -1, "Missing closing tag for " + tag))
-            self.fixes.append((-1, -1, "</" + tag + ">"))
-        
+            yield -1, -1, MISSING_CLOSING, tag
+
+    def _scan_text(self, text, start, line, column, stack, problems, resume=None):
+        """
+        Yield (line, column, missing, tag) for the tags of text from offset
+        start on, recording a checkpoint every checkpoint_interval characters.
+
+        A checkpoint is (offset, line, column, stack, problems): the position
+        of a tag, the open tags before it, and how many problems were found
+        before it. Checkpoints are only taken at a '<' that follows a space,
+        '>' or newline, so no earlier tag name runs into them.
+
+        If resume is given as (checkpoints, delta), the scan stops at the first
+        tag that lands on one of those old checkpoints once shifted by delta,
+        with the same open tags, and returns (checkpoint, line, column).
+        """
+        interval = self.checkpoint_interval
+        next_checkpoint = start
+        old_checkpoints, delta = resume if resume else ((), 0)
+        old_checkpoints = iter(old_checkpoints)
+        target = next(old_checkpoints, None)
+
+        for kind, tag, i, j, offset in self.tokenizer.tokenize_offsets(text, start, line, column):
+            while target is not None and target[0] + delta < offset:
+                target = next(old_checkpoints, None)
+            if target is not None and target[0] + delta == offset and tuple(stack) == target[3]:
+                # Everything from here on is the same as in the old run
+                return target, i, j
+
+            if offset >= next_checkpoint and (offset == 0 or text[offset - 1] in ' >\n'):
+                self.checkpoints.append((offset, i, j, tuple(stack), problems))
+                next_checkpoint = offset + interval
+
+            # Add opening tag to stack
+            if kind == OPEN_TAG:
+                stack.append(tag)
+            # If closing tag with no opening tag
+            elif not stack:
+                problems += 1
+                yield i, j, MISSING_OPENING, tag
+            # If closing tag matches opening tag
+            elif stack[-1] == tag:
+                stack.pop()
+            else:
+                problems += 2
+                yield i, j, MISSING_CLOSING, stack.pop()
+                yield i, j, MISSING_OPENING, tag
+        return None
+
+    def iter_errors(self):
+        """
+        Lazily yield (error, fix) pairs in the order check_consistency records
+        them. The file is only read as far as the consumer iterates, so
+        stopping early (e.g. with itertools.islice) skips the rest of the scan.
+        """
+        for problem in self._iter_problems():
+            yield _describe(*problem)
+
+    def count_errors(self, max_errors=None):
+        """
+        Count the problems per kind and tag name without building messages.
+
+        Returns:
+            Counter: {(missing, tag): count} where missing is MISSING_OPENING
+            or MISSING_CLOSING
+        """
+        counts = Counter()
+        for _, _, missing, tag in islice(self._iter_problems(), max_errors):
+            counts[missing, tag] += 1
+        return counts
+
+    def check_consistency(self, max_errors=None):
+        # Check XML for mismatched tags, stopping after max_errors if given
+        self.errors = []
+        self.fixes = []
+        for error, fix in islice(self.iter_errors(), max_errors):
+            self.errors.append(error)
+            self.fixes.append(fix)
         return len(self.errors)
 
-    def fix_errors(self):
-        #Fix XML errors
+    def recheck(self, start, old_end, new_end):
+        """
+        Re-verify the file after an edit, reusing the previous run.
+
+        The characters [start, old_end) of the previously checked file were
+        replaced by the characters [start, new_end) now on disk. Scanning
+        resumes from the last checkpoint before the edit and stops as soon as
+        it reaches a checkpoint past the edit with the same open tags; the
+        errors after that point are carried over with their positions shifted.
+
+        Requires a previous full check_consistency() with checkpoint_interval
+        set; otherwise the whole file is checked again.
+
+        Returns:
+            int: Number of errors found
+        """
+        if not self.checkpoints:
+            return self.check_consistency()
+
+        text = read_text(self.file_path, self.use_mmap)
+
+        # Nearest checkpoint at or before the edit, or the start of the file
+        k = bisect_right([checkpoint[0] for checkpoint in self.checkpoints], start) - 1
+        offset, line, column, stack, problems = self.checkpoints[k] if k >= 0 else (0, 0, 0, (), 0)
+        later = [checkpoint for checkpoint in self.checkpoints[k + 1:] if checkpoint[0] > old_end]
+        old_errors, old_fixes = self.errors, self.fixes
+
+        self.checkpoints = self.checkpoints[:max(k, 0)]
+        self.errors = old_errors[:problems]
+        self.fixes = old_fixes[:problems]
+        stack = list(stack)
+
+        scan = self._scan_text(text, offset, line, column, stack, problems, (later, new_end - old_end))
+        while True:
+            try:
+                error, fix = _describe(*next(scan))
+            except StopIteration as stop:
+                resumed = stop.value
+                break
+            self.errors.append(error)
+            self.fixes.append(fix)
+
+        if resumed is None:
+            # The edit changed the rest of the file, report the tags left open
+            for tag in stack:
+                error, fix = _describe(-1, -1, MISSING_CLOSING, tag)
+                self.errors.append(error)
+                self.fixes.append(fix)
+            return len(self.errors)
+
+        # Carry the old errors and checkpoints over, shifted to the new positions
+        checkpoint, i, j = resumed
+        line_delta = i - checkpoint[1]
+        column_delta = j - checkpoint[2]
+        problem_delta = len(self.errors) - checkpoint[4]
+        offset_delta = new_end - old_end
+
+        def shift(position):
+            if position[0] == -1:
+                return position
+            if position[0] == checkpoint[1]:
+                return (position[0] + line_delta, position[1] + column_delta) + position[2:]
+            return (position[0] + line_delta,) + position[1:]
+
+        self.errors.extend(shift(error) for error in old_errors[checkpoint[4]:])
+        self.fixes.extend(shift(fix) for fix in old_fixes[checkpoint[4]:])
+        for old in later[later.index(checkpoint):]:
+            self.checkpoints.append(
+                (old[0] + offset_delta,) + shift(old[1:3]) + (old[3], old[4] + problem_delta)
+            )
+        return len(self.errors)
+
+    def _write_fixed(self, output, inserts, trailing):
+        # Copy the file to output chunk by chunk, splicing in the fixes
+        k = 0
+        line = 0
+        column = 0  # Column of chunk[pos]
+        with open(self.file_path, 'r', encoding='utf-8') as file:
+            for chunk in iter(lambda: file.read(self.chunk_size), ''):
+                pos = 0
+                written = 0
+                while k < len(inserts):
+                    target_line, target_column, text = inserts[k]
+                    if line < target_line:
+                        # Skip ahead to the start of the next line
+                        newline = chunk.find('\n', pos)
+                        if newline == -1:
+                            column += len(chunk) - pos
+                            break
+                        line += 1
+                        column = 0
+                        pos = newline + 1
+                        continue
+                    index = pos + max(target_column - column, 0) if line == target_line else pos
+                    if index > len(chunk):
+                        column += len(chunk) - pos
+                        break
+                    output.write(chunk[written:index])
+                    output.write(text)
+                    written = index
+                    column += index - pos
+                    pos = index
+                    k += 1
+                output.write(chunk[written:])
+
+        # Fixes past the end of the file and for tags left open go last
+        for _, _, text in inserts[k:]:
+            output.write(text)
+        for text in trailing:
+            output.write(text)
+
+    def fix_errors(self, output=None):
+        """
+        Write a copy of the file with every fix inserted where its error was found.
+
+        The insertion points are sorted once and the original text is streamed
+        to the output with the fixes spliced in, so the run time is linear in
+        the file size plus the number of fixes.
+
+        Args:
+            output (str or file, optional): Path or writable text file object.
+                Defaults to <name>_fixed.xml next to the input file.
+        """
         if not self.errors:
             print("No errors to fix!")
+            return
+
+        inserts = []
+        trailing = []
+        for error, fix in zip(self.errors, self.fixes):
+            text = '(' + error[2] + ')' + ' ' + fix[2]
+            if error[0] != -1:
+                inserts.append((error[0], error[1], text))
+            else:
+                trailing.append(text + '\n')
+        # Stable sort, so errors found at the same point keep their order
+        inserts.sort(key=lambda insert: (insert[0], insert[1]))
+        # Tags left open are closed innermost first
+        trailing.reverse()
+
+        if output is None:
+            output = self.file_path[:-4] + "_fixed.xml"
+        if hasattr(output, 'write'):
+            self._write_fixed(output, inserts, trailing)
         else:
-            # iterate through fixes and errors backwards
-            with open(self.file_path, 'r') as file:
-                lines = file.readlines()
-                for i in range(len(self.errors) - 1, -1, -1):
-                    error = self.errors[i]
-                    fix = self.fixes[i]
-                    if error[0] != -1:
-                        lines[error[0]] = lines[error[0]][:error[1]] + '(' + error[2] + ')' + ' ' + fix[2] + lines[error[0]][error[1]:]
-                    else:
-                        lines.append('(' + error[2] + ')' + ' ' + fix[2] + '\n')    
-                # open new file with _fixed.xml and write lines
-                with open(self.file_path[:-4] + "_fixed.xml", 'w') as file:
-                    file.writelines(lines)
-            print("Errors fixed!")
+            with open(output, 'w', encoding='utf-8') as file:
+                self._write_fixed(file, inserts, trailing)
+        print("Errors fixed!")
 
 
 # parser = XMLParser("Your file path here")
@@ -2,29 +2,140 @@ import json
 import re
 import traceback
 
+from src.utils.file_utils import read_text, iter_text_chunks
+
+# Default number of characters read at a time in streaming mode
+DEFAULT_CHUNK_SIZE = 1 << 20
+# Indentation of the JSON output, as json.dump(..., indent=4) writes it
+_INDENT = "    "
+
 class XMLCustomParser:
     """Custom XML parsing helper class"""
-    @staticmethod
-    def tokenize(xml_string):
+    # One match per declaration or comment (with the whitespace after it),
+    # tag, or run of text, tried in that order. A '<' that starts none of
+    # them (no '>' follows it) only ends the text before it. Comments may
+    # span lines, declarations may not.
+    _TOKEN = re.compile(r'(?:<\?xml.*?\?>|<!--(?s:.*?)-->)(\s*)|(<[^>]+>)|([^<\s][^<]*)|<')
+
+    @classmethod
+    def tokenize(cls, xml_string):
         """
         Tokenize XML string into meaningful tokens
         
+        The document is scanned once with a precompiled pattern and tokens
+        are yielded as they are found. Declarations and comments are skipped
+        on the way, and the text on both sides of a comment is joined, as if
+        they had been removed from the document first.
+        
         Args:
             xml_string (str): Raw XML content
         
+        Yields:
+            str: Cleaned XML tokens (tags, and text with surrounding whitespace stripped)
+        """
+        return cls._scan(xml_string, True)
+
+    # What may still turn an unsettled match into another kind of token: the
+    # end of a comment, the end of a declaration or of its line, or a '>'
+    _COMMENT_END = re.compile(r'-->')
+    _DECLARATION_END = re.compile(r'\?>|\n')
+    _TAG_END = re.compile(r'>')
+
+    @classmethod
+    def tokenize_chunks(cls, chunks):
+        """
+        Tokenize an XML document that arrives in pieces, giving the same
+        tokens as tokenize() on the whole document.
+
+        Each time, the buffer is tokenized up to the end of its last tag that
+        is sure to stay a tag whatever follows, so no token is cut and text on
+        both sides of a comment still joins up. Only the rest is carried over
+        to the next chunk. While a comment or declaration is left open, only
+        the new part of the buffer is searched for its end.
+
+        Args:
+            chunks (iterable): Consecutive str pieces of the document
+
+        Yields:
+            str: Cleaned XML tokens
+        """
+        buffer = ''
+        # (pattern, offset) of the search that must succeed before the buffer is scanned again
+        waiting = None
+        for chunk in chunks:
+            buffer += chunk
+            if waiting is not None:
+                pattern, offset = waiting
+                if not pattern.search(buffer, offset):
+                    # A terminator is at most 3 characters long
+                    waiting = pattern, max(len(buffer) - 2, offset)
+                    continue
+            cut, waiting = yield from cls._scan(buffer, False)
+            if cut:
+                buffer = buffer[cut:]
+                if waiting is not None:
+                    waiting = waiting[0], waiting[1] - cut
+        if buffer:
+            yield from cls._scan(buffer, True)
+
+    @classmethod
+    def _scan(cls, buffer, final):
+        """
+        Yield the tokens of buffer. Unless final, stop at the first match
+        that more input could still change, and only yield the tokens up to
+        the last tag before it.
+
         Returns:
-            list: Cleaned and tokenized XML elements
+            tuple: (offset just past the last token yielded; None, or the
+            (pattern, offset) search that has to succeed before the match
+            that was stopped at can change)
         """
-        # Remove XML declaration, comments, and normalize whitespace
-        xml_string = re.sub(r'<\?xml.*?\?>', '', xml_string)
-        xml_string = re.sub(r'<!--.*?-->', '', xml_string, flags=re.DOTALL)
-        
-        # Sophisticated tokenization with improved regex
-        tokens = re.findall(r'<[^>]+>|[^<\s][^<]*', xml_string)
-        
-        # Clean and filter tokens
-        tokens = [token.strip() for token in tokens if token.strip()]
-        return tokens
+        # Text seen since the last tag; it starts with a non-space character
+        text = None
+        cut = 0
+        length = len(buffer)
+        for match in cls._TOKEN.finditer(buffer):
+            kind = match.lastindex
+            if not final:
+                start, end = match.span()
+                if end == length:
+                    break
+                if kind == 2:
+                    # A tag is only one because no comment or declaration ends after it yet
+                    if buffer[start + 1] in '!?':
+                        if buffer.startswith('<!--', start):
+                            return cut, (cls._COMMENT_END, start + 4)
+                        if buffer.startswith('<?xml', start) and buffer.find('\n', start) == -1:
+                            return cut, (cls._DECLARATION_END, start + 5)
+                    cut = end
+                elif kind is None:
+                    # A stray '<' becomes a tag once a '>' comes
+                    if buffer[start + 1] != '>':
+                        return cut, (cls._TAG_END, start + 1)
+                    cut = end
+            if kind == 3:
+                text = match[3] if text is None else text + match[3]
+                continue
+            if kind == 1:
+                if text is not None:
+                    text += match[1]
+                continue
+            if text is not None:
+                yield text.rstrip()
+                text = None
+            if kind == 2:
+                yield match[2]
+        if final and text is not None:
+            yield text.rstrip()
+        return cut, None
+
+    @staticmethod
+    def tag_name(tag):
+        """
+        Name of a tag, as parse_tag() gives it, without parsing the attributes.
+        """
+        parts = tag.strip('<>/').split(None, 1)
+        return parts[0] if parts else ''
 
     @staticmethod
     def parse_tag(tag):
@@ -85,18 +196,26 @@ class CustomTreeNode:
         self.children.append(child)
 
 class XMLToJSONConverter:
-    def __init__(self, input_file):
+    def __init__(self, input_file, use_mmap=False, stream=False, chunk_size=DEFAULT_CHUNK_SIZE):
         """
         Initialize the converter with input file
         
         Args:
             input_file (str): Path to the input XML file
+            use_mmap (bool): Decode the input straight from a read-only memory mapping
+            stream (bool): Write the JSON while reading the file in chunks, without building a tree
+            chunk_size (int): Chunk size in characters for stream
         """
         self.input_file = input_file
+        self.use_mmap = use_mmap
+        self.stream = stream
+        self.chunk_size = chunk_size
         self._parser = XMLCustomParser()
+        # Filled in by _build_tree when it fails
         self._debug_info = {
             'current_context': [],
-            'tokens': []
+            'token_index': None,
+            'token': None
         }
 
     def convert_element(self, node):
@@ -138,32 +257,29 @@ class XMLToJSONConverter:
         """
         Build a tree from XML tokens
         
+        The tokens are consumed in a single pass, so the work is linear in
+        their number and any iterable (a list or a generator) will do. Debug
+        context is only put together when an error is raised.
+        
         Args:
-            tokens (list): Tokenized XML elements
+            tokens (iterable): Tokenized XML elements
         
         Returns:
             CustomTreeNode: Root of the parsed XML tree
         """
-        # Store tokens for debug purposes
-        self._debug_info['tokens'] = tokens.copy()
-        
-        if not tokens:
-            raise ValueError("Empty XML content")
-        
         # Stack to track nested elements
         stack = []
         root = None
+        index = -1
+        token = None
+        parse_tag = self._parser.parse_tag
         
         try:
-            while tokens:
-                token = tokens.pop(0)
-                # Debugging: track current context
-                self._debug_info['current_context'] = [node.tag for node in stack]
-                
+            for index, token in enumerate(tokens):
                 # Opening tag (not closing, not self-closing)
                 if token.startswith('<') and not token.startswith('</') and not token.endswith('/>'):
                     # Parse tag
-                    tag_name, attributes = self._parser.parse_tag(token)
+                    tag_name, attributes = parse_tag(token)
                     
                     # Create new node
                     new_node = CustomTreeNode(tag=tag_name, attributes=attributes)
@@ -201,7 +317,7 @@ class XMLToJSONConverter:
                 # Self-closing tag
                 elif token.startswith('<') and token.endswith('/>'):
                     # Parse self-closing tag
-                    tag_name, attributes = self._parser.parse_tag(token)
+                    tag_name, attributes = parse_tag(token)
                     
                     # Create and add node
                     self_closing_node = CustomTreeNode(tag=tag_name, attributes=attributes)
@@ -222,15 +338,22 @@ class XMLToJSONConverter:
                             current_node.text += ' ' + token
         
         except Exception as e:
-            # Enhance error with debug information
+            # Enhance error with debug information, gathered only now
+            self._debug_info = {
+                'current_context': [node.tag for node in stack],
+                'token_index': index,
+                'token': token,
+            }
             error_details = (
                 f"Error Details:\n"
-                f"Tokens Remaining: {tokens}\n"
-                f"Current Context: {self._debug_info['current_context']}\n"
-                f"Full Token List: {self._debug_info['tokens']}"
+                f"Token {index}: {token}\n"
+                f"Current Context: {self._debug_info['current_context']}"
             )
             raise ValueError(f"{str(e)}\n{error_details}") from e
         
+        if index == -1:
+            raise ValueError("Empty XML content")
+        
         # Ensure all tags are closed
         if stack:
             context = ' > '.join(node.tag for node in stack)
@@ -238,6 +361,200 @@ class XMLToJSONConverter:
         
         return root
 
+    def _stream_tokens(self):
+        # Tokens of the input file, read one chunk at a time
+        chunks = iter_text_chunks(self.input_file, self.chunk_size, self.use_mmap, encoding='utf-8')
+        return self._parser.tokenize_chunks(chunks)
+
+    def _scan_arrays(self, tokens):
+        """
+        Check the tokens as _build_tree does, and find the elements whose
+        values are written as JSON arrays.
+
+        The elements (opening and self-closing tags) are numbered in document
+        order. An element followed by a sibling with the same tag starts an
+        array, and gets its bit set in the result. Repeated siblings that are
+        not next to each other would have to be gathered into one array
+        ahead of the elements in between, so they are rejected.
+
+        Args:
+            tokens (iterable): Tokenized XML elements
+
+        Returns:
+            bytearray: Bitmap of the elements that start an array
+        """
+        arrays = bytearray()
+        # One [tag, child tags seen, last child tag, its number, siblings in its run] per open element
+        stack = []
+        root = False
+        element = -1
+        index = -1
+        token = None
+        tag_name = self._parser.tag_name
+
+        try:
+            for index, token in enumerate(tokens):
+                if not token.startswith('<'):
+                    continue
+                if token.startswith('</'):
+                    closing_tag = token.strip('</>')
+                    if not stack:
+                        raise ValueError(f"Unexpected closing tag: {closing_tag}")
+                    if stack[-1][0] != closing_tag:
+                        context = ' > '.join(frame[0] for frame in stack)
+                        raise ValueError(
+                            f"Mismatched closing tag: Expected </>{stack[-1][0]}, "
+                            f"found </{closing_tag}>. Context: {context}"
+                        )
+                    stack.pop()
+                    continue
+
+                element += 1
+                tag = tag_name(token)
+                if stack:
+                    parent = stack[-1]
+                    if parent[2] == tag:
+                        if parent[4] == 1:
+                            if parent[3] >> 3 >= len(arrays):
+                                arrays.extend(bytes((parent[3] >> 3) + 1))
+                            arrays[parent[3] >> 3] |= 1 << (parent[3] & 7)
+                        parent[4] += 1
+                    elif tag in parent[1]:
+                        raise ValueError(
+                            f"Repeated <{tag}> elements under <{parent[0]}> are not next to each other, "
+                            f"which cannot be converted in streaming mode"
+                        )
+                    else:
+                        parent[1].add(tag)
+                        parent[2], parent[3], parent[4] = tag, element, 1
+                root = True
+                if not token.endswith('/>'):
+                    stack.append([tag, set(), None, -1, 0])
+
+        except Exception as e:
+            self._debug_info = {
+                'current_context': [frame[0] for frame in stack],
+                'token_index': index,
+                'token': token,
+            }
+            error_details = (
+                f"Error Details:\n"
+                f"Token {index}: {token}\n"
+                f"Current Context: {self._debug_info['current_context']}"
+            )
+            raise ValueError(f"{str(e)}\n{error_details}") from e
+
+        if index == -1:
+            raise ValueError("Empty XML content")
+        if stack:
+            context = ' > '.join(frame[0] for frame in stack)
+            raise ValueError(f"Not all tags were closed. Unclosed tags: {context}")
+        if not root:
+            raise ValueError("No root element")
+        return arrays
+
+    def _write_stream(self, tokens, arrays, output):
+        """
+        Write the JSON of checked tokens to output as they come, with the
+        same layout as convert_element() and json.dump(..., indent=4).
+
+        Only the open elements are kept, each with its attributes and text
+        until its value is written and with the array its children are in,
+        if any. The one difference is that the text of an element that also
+        has children comes last instead of first among its keys, since it
+        is only complete at the closing tag.
+
+        Args:
+            tokens (iterable): Tokens already checked by _scan_arrays()
+            arrays (bytearray): Bitmap returned by _scan_arrays()
+            output (file): Text file to write to
+        """
+        write = output.write
+        dumps = json.dumps
+        parse_tag = self._parser.parse_tag
+        # One [tag, attributes, text, level, written (an object opened), open array tag] per open element
+        stack = []
+        element = -1
+        done = False
+
+        for token in tokens:
+            if not token.startswith('<'):
+                if stack:
+                    frame = stack[-1]
+                    frame[2] = token if frame[2] is None else frame[2] + ' ' + token
+                continue
+
+            if not token.startswith('</'):
+                element += 1
+                if done:
+                    continue
+                tag, attributes = parse_tag(token)
+                if not stack:
+                    write('{\n' + _INDENT + dumps(tag) + ': ')
+                    level = 1
+                else:
+                    parent = stack[-1]
+                    indent = '\n' + _INDENT * (parent[3] + 1)
+                    if not parent[4]:
+                        write('{')
+                        separator = ''
+                        for key, value in parent[1].items():
+                            write(separator + indent + dumps(key) + ': ' + dumps(value))
+                            separator = ','
+                        parent[4] = True
+                        parent[1] = None
+                        members = separator
+                    else:
+                        members = ','
+                    if parent[5] == tag:
+                        write(',' + indent + _INDENT)
+                        level = parent[3] + 2
+                    else:
+                        if parent[5] is not None:
+                            write(indent + ']')
+                            parent[5] = None
+                        write(members + indent + dumps(tag) + ': ')
+                        level = parent[3] + 1
+                        if element >> 3 < len(arrays) and arrays[element >> 3] >> (element & 7) & 1:
+                            write('[' + indent + _INDENT)
+                            parent[5] = tag
+                            level += 1
+                stack.append([tag, attributes, None, level, False, None])
+                if not token.endswith('/>'):
+                    continue
+            elif done:
+                continue
+
+            tag, attributes, text, level, written, array = stack.pop()
+            indent = '\n' + _INDENT * level
+            if written:
+                if array is not None:
+                    write(indent + _INDENT + ']')
+                if text is not None:
+                    write(',' + indent + _INDENT + '"text": ' + dumps(text))
+                write(indent + '}')
+            elif text is not None:
+                write(dumps(text))
+            elif attributes:
+                write('{' + ','.join(indent + _INDENT + dumps(key) + ': ' + dumps(value)
+                                     for key, value in attributes.items()) + indent + '}')
+            else:
+                write('{}')
+            if not stack:
+                write('\n}')
+                done = True
+
+    def _convert_stream(self, output_path):
+        """
+        Convert in two passes over the file read in chunks: the first checks
+        it and finds the arrays, the second writes the JSON. Memory use
+        depends on the depth of the document, not its size (apart from one
+        bit per element).
+        """
+        arrays = self._scan_arrays(self._stream_tokens())
+        with open(output_path, 'w', encoding='utf-8') as f:
+            self._write_stream(self._stream_tokens(), arrays, f)
+
     def convert(self, output_path):
         """
         Convert XML file to JSON
@@ -246,9 +563,13 @@ class XMLToJSONConverter:
             output_path (str): Path to save the output JSON file
         """
         try:
+            if self.stream:
+                self._convert_stream(output_path)
+                print(f'Successfully converted XML to JSON. Output file saved at: {output_path}')
+                return
+
             # Read input file
-            with open(self.input_file, 'r', encoding='utf-8') as f:
-                xml_content = f.read()
+            xml_content = read_text(self.input_file, self.use_mmap, encoding='utf-8')
             
             # Tokenize XML
             tokens = self._parser.tokenize(xml_content)
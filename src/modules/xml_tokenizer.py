@@ -0,0 +1,179 @@
+import re
+
+OPEN_TAG = "open"
+CLOSE_TAG = "close"
+
+
+class XMLTokenizer:
+    """
+    Single-pass tag scanner shared by the XML modules.
+
+    Tag boundaries are located with str.find and a compiled pattern instead of
+    walking the document one character at a time, so the cost of a scan is
+    linear in the size of the input.
+    """
+
+    # Everything up to the end of the tag name (a space, '>' or the end of the
+    # line). A trailing newline is kept, the same way XMLParser.extract_tag
+    # keeps reading until the end of the line it was given.
+    _TAG_NAME = re.compile(r"[^ >\n]*\n?")
+
+    def tokenize(self, text):
+        """
+        Yield the tags of an XML document in order of appearance.
+
+        Args:
+            text (str): Raw XML content
+
+        Yields:
+            tuple: (kind, name, line, column) where kind is OPEN_TAG or
+            CLOSE_TAG, name is the tag name without '<', '/' or '>', and
+            line/column are 0-based positions of the '<' character.
+            Declarations and comments (<? ... > and <! ... >) are skipped.
+        """
+        return self.tokenize_chunks((text,))
+
+    def tokenize_chunks(self, chunks):
+        """
+        Yield the tags of an XML document that arrives in pieces.
+
+        A tag that is cut by a chunk boundary is carried over and emitted once
+        the next chunk completes it, so at most one chunk plus a partial tag
+        is held in memory at any time.
+
+        Args:
+            chunks (iterable): Consecutive str pieces of the document
+
+        Yields:
+            tuple: Same (kind, name, line, column) events as tokenize()
+        """
+        match_name = self._TAG_NAME.match
+
+        line = 0
+        line_start = 0  # Offset of the current line, relative to buffer
+        buffer = ""
+        chunks = iter(chunks)
+
+        final = False
+        while not final:
+            chunk = next(chunks, None)
+            final = chunk is None
+            if not final:
+                buffer += chunk
+
+            scanned = 0
+            pos = buffer.find("<")
+            while pos != -1:
+                name = match_name(buffer, pos + 1).group()
+                # The tag name runs into the end of the buffer, wait for more
+                if not final and pos + 1 + len(name) == len(buffer) and not name.endswith("\n"):
+                    break
+
+                # Advance the line counter over the text between the two tags
+                newlines = buffer.count("\n", scanned, pos)
+                if newlines:
+                    line += newlines
+                    line_start = buffer.rfind("\n", scanned, pos) + 1
+                scanned = pos
+
+                if "?" not in name and "!" not in name:
+                    if "<" in name:
+                        name = name.replace("<", "")
+                    if name:
+                        if name[0] == "/":
+                            yield CLOSE_TAG, name[1:], line, pos - line_start
+                        else:
+                            yield OPEN_TAG, name, line, pos - line_start
+
+                pos = buffer.find("<", pos + 1)
+
+            # Keep only the unfinished tag (if any) for the next chunk
+            keep = pos if pos != -1 else len(buffer)
+            newlines = buffer.count("\n", scanned, keep)
+            if newlines:
+                line += newlines
+                line_start = buffer.rfind("\n", scanned, keep) + 1
+            line_start -= keep
+            buffer = buffer[keep:]
+
+    def tokenize_offsets(self, text, start=0, line=0, column=0):
+        """
+        Yield the tags of an XML document from a given offset on, together
+        with the offset of each tag.
+
+        Args:
+            text (str): Raw XML content
+            start (int): Offset to start scanning at
+            line (int): Line of the character at start
+            column (int): Column of the character at start
+
+        Yields:
+            tuple: (kind, name, line, column, offset) with the first four
+            fields as in tokenize()
+        """
+        find = text.find
+        count = text.count
+        match_name = self._TAG_NAME.match
+
+        line_start = start - column
+        scanned = start
+
+        pos = find("<", start)
+        while pos != -1:
+            # Advance the line counter over the text between the two tags
+            newlines = count("\n", scanned, pos)
+            if newlines:
+                line += newlines
+                line_start = text.rfind("\n", scanned, pos) + 1
+            scanned = pos
+
+            name = match_name(text, pos + 1).group()
+            if "?" not in name and "!" not in name:
+                if "<" in name:
+                    name = name.replace("<", "")
+                if name:
+                    if name[0] == "/":
+                        yield CLOSE_TAG, name[1:], line, pos - line_start, pos
+                    else:
+                        yield OPEN_TAG, name, line, pos - line_start, pos
+
+            pos = find("<", pos + 1)
+
+    def tokenize_index(self, index):
+        """
+        Yield the tags of an XML document from its StructuralIndex.
+
+        Tag name boundaries, declaration/comment markers, line numbers and
+        columns are all computed with vectorized searches over the index;
+        only the names themselves are decoded one tag at a time.
+
+        Args:
+            index (StructuralIndex): Index over the raw bytes of the document
+
+        Yields:
+            tuple: Same (kind, name, line, column) events as tokenize()
+        """
+        data = index.data
+        opens, ends, nested = index.tag_spans()
+        if not len(opens):
+            return
+        closing = index.array[opens + 1] == ord("/")
+        lines = index.lines(opens)
+        columns = index.columns(opens, lines)
+
+        for start, end, nest, close, line, column in zip(
+            opens.tolist(), ends.tolist(), nested.tolist(),
+            closing.tolist(), lines.tolist(), columns.tolist(),
+        ):
+            name = data[start + 1:end].decode()
+            if "\r" in name:
+                name = name.replace("\r\n", "\n")
+            if nest:
+                name = name.replace("<", "")
+                if not name:
+                    continue
+                close = name[0] == "/"
+            if close:
+                yield CLOSE_TAG, name[1:], line, column
+            else:
+                yield OPEN_TAG, name, line, column
@@ -1,10 +1,35 @@
+from src.utils.file_utils import open_mapped
+
+
 class PostSearch:
-    def __init__(self, xml_file):
+    def __init__(self, xml_file, use_mmap=False):
         """
         Initialize the PostSearch object by loading the XML file content as a string.
+        With use_mmap the content is a read-only memory mapping of the file
+        instead, and only the posts being searched are decoded.
+        """
+        if use_mmap:
+            self.xml_content = open_mapped(xml_file)
+        else:
+            with open(xml_file, 'r', encoding='utf-8') as file:
+                self.xml_content = file.read()
+
+    def close(self):
         """
-        with open(xml_file, 'r', encoding='utf-8') as file:
-            self.xml_content = file.read()
+        Release the memory mapping of the file, if any.
+        """
+        if hasattr(self.xml_content, "close"):
+            self.xml_content.close()
+
+    def _literal(self, text):
+        # Markup to search for, as bytes when the content is a mapping
+        return text if isinstance(self.xml_content, str) else text.encode('utf-8')
+
+    def _text(self, content):
+        # Decode content found in a mapping, with the line breaks text mode would give
+        if isinstance(content, str):
+            return content
+        return content.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
 
     def search_word(self, word):
         """
@@ -13,30 +38,32 @@ class PostSearch:
         posts = []
         user_start = 0
         word_lower = word.lower()  # Convert the search word to lowercase for case-insensitive comparison
+        user_tag, user_end_tag = self._literal("<user>"), self._literal("</user>")
+        post_tag, post_end_tag = self._literal("<post>"), self._literal("</post>")
 
         # Iterate over <user> elements
         while True:
-            user_start = self.xml_content.find("<user>", user_start)
+            user_start = self.xml_content.find(user_tag, user_start)
             if user_start == -1:
                 break
-            user_end = self.xml_content.find("</user>", user_start)
+            user_end = self.xml_content.find(user_end_tag, user_start)
             user_content = self.xml_content[user_start:user_end]
 
             # Iterate over <post> elements within the user
             post_start = 0
             while True:
-                post_start = user_content.find("<post>", post_start)
+                post_start = user_content.find(post_tag, post_start)
                 if post_start == -1:
                     break
-                post_end = user_content.find("</post>", post_start)
+                post_end = user_content.find(post_end_tag, post_start)
                 post_content = user_content[post_start:post_end]
 
                 # Extract <body> and check for the word
                 body_content = self._extract_tag_value(post_content, "body")
                 if body_content and word_lower in body_content.lower():  # Case-insensitive comparison
                     posts.append(body_content.strip())
-                post_start = post_end + len("</post>")
-            user_start = user_end + len("</user>")
+                post_start = post_end + len(post_end_tag)
+            user_start = user_end + len(user_end_tag)
         return posts
 
     def search_topic(self, topic):
@@ -46,22 +73,24 @@ class PostSearch:
         posts = []
         user_start = 0
         topic_lower = topic.lower()  # Convert the search topic to lowercase for case-insensitive comparison
+        user_tag, user_end_tag = self._literal("<user>"), self._literal("</user>")
+        post_tag, post_end_tag = self._literal("<post>"), self._literal("</post>")
 
         # Iterate over <user> elements
         while True:
-            user_start = self.xml_content.find("<user>", user_start)
+            user_start = self.xml_content.find(user_tag, user_start)
             if user_start == -1:
                 break
-            user_end = self.xml_content.find("</user>", user_start)
+            user_end = self.xml_content.find(user_end_tag, user_start)
             user_content = self.xml_content[user_start:user_end]
 
             # Iterate over <post> elements within the user
             post_start = 0
             while True:
-                post_start = user_content.find("<post>", post_start)
+                post_start = user_content.find(post_tag, post_start)
                 if post_start == -1:
                     break
-                post_end = user_content.find("</post>", post_start)
+                post_end = user_content.find(post_end_tag, post_start)
                 post_content = user_content[post_start:post_end]
 
                 # Check if the topic is mentioned
@@ -71,8 +100,8 @@ class PostSearch:
                     body_content = self._extract_tag_value(post_content, "body")
                     if body_content:
                         posts.append(body_content.strip())
-                post_start = post_end + len("</post>")
-            user_start = user_end + len("</user>")
+                post_start = post_end + len(post_end_tag)
+            user_start = user_end + len(user_end_tag)
         return posts
 
 
@@ -98,8 +127,8 @@ class PostSearch:
         """
         Extract the value of a given tag from the content.
         """
-        start_tag = f"<{tag}>"
-        end_tag = f"</{tag}>"
+        start_tag = self._literal(f"<{tag}>")
+        end_tag = self._literal(f"</{tag}>")
         start = content.find(start_tag)
         if start == -1:
             return None
@@ -107,5 +136,5 @@ class PostSearch:
         end = content.find(end_tag, start)
         if end == -1:
             return None
-        return content[start:end]
+        return self._text(content[start:end])
 
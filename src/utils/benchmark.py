@@ -0,0 +1,202 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+# Add the project root to sys.path dynamically
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from src.utils.xml_generator import SocialNetworkGenerator, parse_size
+from src.modules.xml_parser import XMLParser
+from src.modules.xml_formatter import XMLFormatter
+from src.modules.xml_minifier import XMLMinifier
+from src.modules.xml_compressor import XMLCompressor
+from src.modules.xml_decompressor import XMLDecompressor
+from src.modules.xml_to_json import XMLToJSONConverter
+from src.graph.graph_representation import GraphRepresentation
+from src.graph.network_analysis import NetworkAnalysis
+from src.postsearch.post_search import PostSearch
+
+DEFAULT_SIZES = ["1MB", "10MB", "100MB"]
+
+
+# Each operation takes the input document, a scratch directory and whether to
+# read through a memory mapping, does any untimed preparation and returns the
+# callable that is measured.
+
+def _verify(input_path, workdir, use_mmap):
+    return lambda: XMLParser(input_path, use_mmap=use_mmap).check_consistency()
+
+def _format(input_path, workdir, use_mmap):
+    return lambda: XMLFormatter(input_path, use_mmap).prettify(os.path.join(workdir, "formatted.xml"))
+
+def _minify(input_path, workdir, use_mmap):
+    return lambda: XMLMinifier(input_path, use_mmap).minify(os.path.join(workdir, "minified.xml"))
+
+def _compress(input_path, workdir, use_mmap):
+    return lambda: XMLCompressor(input_path, use_mmap).compress(os.path.join(workdir, "compressed.xml"))
+
+def _decompress(input_path, workdir, use_mmap):
+    compressed = os.path.join(workdir, "compressed.xml")
+    XMLCompressor(input_path).compress(compressed)
+    return lambda: XMLDecompressor(compressed, use_mmap).decompress(os.path.join(workdir, "decompressed.xml"))
+
+def _json(input_path, workdir, use_mmap):
+    return lambda: XMLToJSONConverter(input_path, use_mmap).convert(os.path.join(workdir, "output.json"))
+
+def _graph(input_path, workdir, use_mmap):
+    return lambda: GraphRepresentation.build_graph(input_path, use_mmap)
+
+def _analytics(input_path, workdir, use_mmap):
+    analysis = NetworkAnalysis(GraphRepresentation.build_graph(input_path, use_mmap))
+
+    def run():
+        analysis.get_most_active_user()
+        analysis.get_most_influencer_user()
+        analysis.get_mutual_users([1, 2])
+        analysis.get_suggested_users(1)
+    return run
+
+def _search(input_path, workdir, use_mmap):
+    def run():
+        search = PostSearch(input_path, use_mmap)
+        search.search_word("lorem")
+        search.search_topic("economy")
+        search.close()
+    return run
+
+
+OPERATIONS = {
+    "verify": _verify,
+    "format": _format,
+    "minify": _minify,
+    "compress": _compress,
+    "decompress": _decompress,
+    "json": _json,
+    "graph": _graph,
+    "analytics": _analytics,
+    "search": _search,
+}
+
+
+def _measure(operation, input_path, trace, use_mmap):
+    # Runs in a fresh worker process so that runs do not share caches or heap.
+    # The modules print progress messages, which are silenced here.
+    with tempfile.TemporaryDirectory() as workdir, open(os.devnull, "w") as devnull, \
+            contextlib.redirect_stdout(devnull):
+        run = OPERATIONS[operation](input_path, workdir, use_mmap)
+        if trace:
+            tracemalloc.start()
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return peak
+        start = time.perf_counter()
+        run()
+        return time.perf_counter() - start
+
+
+def measure(operation, input_path, memory=True, use_mmap=False):
+    """
+    Time one operation on one input, and optionally record its peak memory.
+
+    The timing and the memory figure come from two separate runs, each in its
+    own process, because tracing allocations slows the code down.
+
+    Args:
+        operation (str): Key of OPERATIONS
+        input_path (str): XML document to run it on
+        memory (bool): Whether to record peak traced memory as well
+        use_mmap (bool): Have the modules read through a memory mapping
+
+    Returns:
+        dict: operation, bytes, seconds, mb_per_s and peak_mb (None if not
+        recorded). Throughput is always relative to the size of input_path.
+    """
+    size = os.path.getsize(input_path)
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        seconds = executor.submit(_measure, operation, input_path, False, use_mmap).result()
+    peak = None
+    if memory:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            peak = executor.submit(_measure, operation, input_path, True, use_mmap).result()
+
+    return {
+        "operation": operation,
+        "bytes": size,
+        "seconds": seconds,
+        "mb_per_s": size / (1 << 20) / seconds if seconds else float("inf"),
+        "peak_mb": peak / (1 << 20) if peak is not None else None,
+    }
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, operations=None, workdir=None, seed=0, memory=True, report=print,
+                   use_mmap=False):
+    """
+    Generate one document per size and measure every operation on it.
+
+    Generated documents are kept in workdir and reused by later runs with the
+    same size and seed.
+
+    Args:
+        sizes (list): Target sizes, e.g. ['1MB', '1GB']
+        operations (list): Keys of OPERATIONS to run (all of them by default)
+        workdir (str): Directory for the generated inputs
+        seed (int): Generator seed
+        memory (bool): Whether to record peak memory
+        report (callable): Called with one formatted line per result
+        use_mmap (bool): Have the modules read through a memory mapping
+
+    Returns:
+        list: One result dict per (size, operation), as returned by measure()
+    """
+    operations = operations or list(OPERATIONS)
+    workdir = workdir or os.path.join(tempfile.gettempdir(), "nodescope_bench")
+    os.makedirs(workdir, exist_ok=True)
+    generator = SocialNetworkGenerator(seed=seed)
+
+    results = []
+    for size in sizes:
+        input_path = os.path.join(workdir, f"social_{size}_{seed}.xml")
+        if not os.path.exists(input_path):
+            users = generator.generate_size(input_path, size)
+            report(f"Generated {input_path} ({users} users, {os.path.getsize(input_path) / (1 << 20):.1f} MB)")
+
+        for operation in operations:
+            result = measure(operation, input_path, memory, use_mmap)
+            result["size"] = size
+            results.append(result)
+            peak = f"{result['peak_mb']:10.1f} MB peak" if result["peak_mb"] is not None else ""
+            report(f"{size:>8} {operation:<11} {result['seconds']:9.3f} s {result['mb_per_s']:9.2f} MB/s {peak}".rstrip())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and peak memory of the XML operations at scale")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="Input sizes, e.g. 1MB 10MB 1GB")
+    parser.add_argument("--ops", nargs="+", choices=list(OPERATIONS), help="Operations to run (default: all)")
+    parser.add_argument("--workdir", help="Directory for the generated inputs")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the peak memory runs")
+    parser.add_argument("--mmap", action="store_true", help="Read the inputs through memory mappings")
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        parse_size(size)  # Fail early on a malformed size
+
+    results = run_benchmarks(args.sizes, args.ops, args.workdir, args.seed, not args.no_memory,
+                             use_mmap=args.mmap)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,9 @@
+import codecs
+import io
+import locale
+import mmap
 import os
+from contextlib import contextmanager
 
 def read_file(file_path):
     with open(file_path, 'r') as file:
@@ -10,3 +15,159 @@ def write_file(file_path, content):
 
 def file_exists(file_path):
     return os.path.exists(file_path)
+
+def open_mapped(file_path):
+    """
+    Map a file read-only into memory.
+
+    The mapping is backed by the page cache, so any number of readers (in
+    this process or others) share one copy of the file instead of each
+    holding a private buffer. The caller owns the mapping and should close()
+    it when done; an empty file gives b'' since it cannot be mapped.
+
+    Args:
+        file_path (str): Path to the file
+
+    Returns:
+        mmap.mmap | bytes: Bytes-like view of the whole file
+    """
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+@contextmanager
+def map_file(file_path):
+    """
+    Context manager around open_mapped() that closes the mapping on exit.
+
+    Views still holding on to the mapping (e.g. NumPy arrays) keep it alive;
+    it is then unmapped when the last of them is released.
+    """
+    data = open_mapped(file_path)
+    try:
+        yield data
+    finally:
+        if isinstance(data, mmap.mmap):
+            try:
+                data.close()
+            except BufferError:
+                pass
+
+def read_text(file_path, use_mmap=False, encoding=None):
+    """
+    Read a whole file as text, with the same newline handling as open(file_path, 'r').
+
+    With use_mmap the text is decoded straight from a read-only mapping, so
+    the intermediate bytes buffer of a regular read is never allocated.
+
+    Args:
+        file_path (str): Path to the file
+        use_mmap (bool): Decode from a memory mapping instead of read()
+        encoding (str): Text encoding (the locale's by default, as open() does)
+
+    Returns:
+        str: Content of the file
+    """
+    if not use_mmap:
+        with open(file_path, 'r', encoding=encoding) as file:
+            return file.read()
+    with map_file(file_path) as data:
+        text = str(data, encoding or locale.getpreferredencoding(False))
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+def normalize_newlines(data):
+    """
+    Translate '\\r\\n' and '\\r' line breaks in bytes-like data to '\\n', as
+    text mode reading does. Data without '\\r' is returned as is (no copy).
+    """
+    if data.find(b'\r') == -1:
+        return data
+    return bytes(data).replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+def normalize_chunks(chunks):
+    """
+    normalize_newlines() over consecutive bytes chunks. A '\\r' at the end of
+    a chunk is held back until the next one shows whether a '\\n' follows.
+    """
+    held = b''
+    for chunk in chunks:
+        if held:
+            chunk = held + chunk
+        held = b'\r' if chunk.endswith(b'\r') else b''
+        if held:
+            chunk = chunk[:-1]
+        if chunk:
+            yield normalize_newlines(chunk)
+    if held:
+        yield b'\n'
+
+def iter_text_chunks(file_path, chunk_size, use_mmap=False, encoding=None):
+    """
+    Read a file as text in pieces of at most chunk_size characters, with the
+    same newline handling as open(file_path, 'r').
+
+    The file is opened right away, so a missing file raises here rather than
+    on the first iteration.
+
+    Args:
+        file_path (str): Path to the file
+        chunk_size (int): Size of each piece (bytes of the mapping with use_mmap)
+        use_mmap (bool): Decode from a memory mapping instead of read()
+        encoding (str): Text encoding (the locale's by default, as open() does)
+
+    Returns:
+        iterator: str chunks in file order
+    """
+    if use_mmap:
+        return _decode_chunks(open_mapped(file_path), chunk_size, encoding)
+    return _read_chunks(open(file_path, 'r', encoding=encoding), chunk_size)
+
+def iter_byte_chunks(file_path, chunk_size, use_mmap=False):
+    """
+    Read a file as raw bytes in pieces of at most chunk_size bytes, without
+    decoding or newline translation.
+
+    The file is opened right away, so a missing file raises here rather than
+    on the first iteration.
+
+    Args:
+        file_path (str): Path to the file
+        chunk_size (int): Size of each piece
+        use_mmap (bool): Slice a memory mapping instead of read()
+
+    Returns:
+        iterator: bytes chunks in file order
+    """
+    if use_mmap:
+        return _slice_chunks(open_mapped(file_path), chunk_size)
+    return _read_chunks(open(file_path, 'rb'), chunk_size)
+
+def _read_chunks(file, chunk_size):
+    with file:
+        yield from iter(lambda: file.read(chunk_size), file.read(0))
+
+def _slice_chunks(data, chunk_size):
+    try:
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+def _decode_chunks(data, chunk_size, encoding):
+    decoder = codecs.getincrementaldecoder(encoding or locale.getpreferredencoding(False))()
+    decoder = io.IncrementalNewlineDecoder(decoder, translate=True)
+    try:
+        for start in range(0, len(data), chunk_size):
+            chunk = decoder.decode(data[start:start + chunk_size])
+            if chunk:
+                yield chunk
+        chunk = decoder.decode(b'', final=True)
+        if chunk:
+            yield chunk
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
@@ -0,0 +1,154 @@
+import random
+
+FIRST_NAMES = [
+    "Ahmed", "Yasser", "Mohamed", "Omar", "Sara", "Mona", "Youssef", "Nour",
+    "Hana", "Karim", "Laila", "Mostafa", "Salma", "Tarek", "Farida", "Ali",
+]
+LAST_NAMES = [
+    "Ali", "Ahmed", "Hassan", "Ibrahim", "Mahmoud", "Khaled", "Fathy", "Saad",
+    "Nabil", "Samir", "Adel", "Fouad", "Ramadan", "Sherif", "Zaki", "Gamal",
+]
+TOPICS = [
+    "economy", "solar_energy", "education", "sports", "health", "technology",
+    "politics", "travel", "food", "music", "science", "art",
+]
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+    "exercitation ullamco laboris nisi aliquip ex ea commodo consequat"
+).split()
+
+UNITS = {"B": 1, "KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30}
+
+# Users rendered up front to estimate how many fit in the requested size
+_SAMPLE_USERS = 256
+
+
+def parse_size(size):
+    """
+    Convert a human readable size such as '10MB' to a number of bytes.
+
+    Args:
+        size (str | int): Size with an optional B/KB/MB/GB suffix
+
+    Returns:
+        int: Number of bytes
+    """
+    if isinstance(size, int):
+        return size
+    text = size.strip().upper()
+    for unit in ("KB", "MB", "GB", "B"):
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * UNITS[unit])
+    return int(text)
+
+
+class SocialNetworkGenerator:
+    """
+    Deterministic generator for the users/posts/followers documents read by
+    GraphRepresentation and PostSearch.
+
+    The same seed and user count always produce the same file. Follower ids
+    are drawn partly uniformly and partly from a heavy-tailed distribution,
+    so a few users end up with many followers, as in a real network.
+    """
+
+    def __init__(self, seed=0, max_posts=4, max_followers=8, max_words=40):
+        """
+        Args:
+            seed (int): Seed for the random number generator
+            max_posts (int): Upper bound on posts per user
+            max_followers (int): Upper bound on followers per user
+            max_words (int): Upper bound on words per post body
+        """
+        self.seed = seed
+        self.max_posts = max_posts
+        self.max_followers = max_followers
+        self.max_words = max_words
+
+    def _render_user(self, rng, user_id, user_count):
+        parts = [
+            "\t<user>\n",
+            f"\t\t<id>{user_id}</id>\n",
+            f"\t\t<name>{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}</name>\n",
+            "\t\t<posts>\n",
+        ]
+        for _ in range(rng.randint(1, self.max_posts)):
+            body = " ".join(rng.choices(WORDS, k=rng.randint(3, self.max_words)))
+            parts.append("\t\t\t<post>\n")
+            parts.append(f"\t\t\t\t<body>\n\t\t\t\t\t{body.capitalize()}.\n\t\t\t\t</body>\n")
+            parts.append("\t\t\t\t<topics>\n")
+            for topic in rng.sample(TOPICS, rng.randint(1, 3)):
+                parts.append(f"\t\t\t\t\t<topic>{topic}</topic>\n")
+            parts.append("\t\t\t\t</topics>\n")
+            parts.append("\t\t\t</post>\n")
+        parts.append("\t\t</posts>\n")
+
+        parts.append("\t\t<followers>\n")
+        followers = set()
+        for _ in range(rng.randint(0, min(self.max_followers, user_count - 1))):
+            if rng.random() < 0.5:
+                follower = rng.randint(1, user_count)
+            else:
+                follower = min(user_count, int(rng.paretovariate(1.2)))
+            if follower != user_id:
+                followers.add(follower)
+        for follower in sorted(followers):
+            parts.append(f"\t\t\t<follower>\n\t\t\t\t<id>{follower}</id>\n\t\t\t</follower>\n")
+        parts.append("\t\t</followers>\n")
+        parts.append("\t</user>\n")
+        return "".join(parts)
+
+    def estimate_users(self, size):
+        """
+        Number of users needed for a document of roughly the given size.
+
+        Args:
+            size (int): Target size in bytes
+
+        Returns:
+            int: User count
+        """
+        rng = random.Random(self.seed)
+        sample = sum(len(self._render_user(rng, user_id, _SAMPLE_USERS).encode("utf-8"))
+                     for user_id in range(1, _SAMPLE_USERS + 1))
+        return max(1, round(size * _SAMPLE_USERS / sample))
+
+    def generate(self, output_path, user_count):
+        """
+        Write a document with the given number of users.
+
+        Users are rendered and written one at a time, so memory use does not
+        depend on the size of the output.
+
+        Args:
+            output_path (str): Path of the XML file to write
+            user_count (int): Number of users in the document
+
+        Returns:
+            int: Number of bytes written
+        """
+        rng = random.Random(self.seed)
+        written = 0
+        # Encoded here, so that written counts bytes rather than characters
+        with open(output_path, "wb") as file:
+            written += file.write(b"<users>\n")
+            for user_id in range(1, user_count + 1):
+                written += file.write(self._render_user(rng, user_id, user_count).encode("utf-8"))
+            written += file.write(b"</users>\n")
+        return written
+
+    def generate_size(self, output_path, size):
+        """
+        Write a document of roughly the given size (within a few percent).
+
+        Args:
+            output_path (str): Path of the XML file to write
+            size (str | int): Target size, e.g. '100MB' or a number of bytes
+
+        Returns:
+            int: Number of users written
+        """
+        user_count = self.estimate_users(parse_size(size))
+        self.generate(output_path, user_count)
+        return user_count
@@ -0,0 +1,68 @@
+import argparse
+import sys
+
+import pytest
+
+from src.cli import cli_handler
+from src.cli.cli_handler import positive_int
+
+
+def test_max_errors_must_be_positive(tmp_path, monkeypatch):
+    assert positive_int("3") == 3
+    for value in ("0", "-2"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            positive_int(value)
+
+    path = tmp_path / "broken.xml"
+    path.write_text("<a><b></a>")
+    monkeypatch.setattr(sys, "argv", ["cli_handler.py", "verify", "-i", str(path), "-m", "0"])
+    with pytest.raises(SystemExit) as exit_info:
+        cli_handler.main()
+    assert exit_info.value.code == 2
+
+def test_verify_directory(tmp_path, capsys):
+    (tmp_path / "nested").mkdir()
+    valid = tmp_path / "valid.xml"
+    valid.write_text("<users><user><id>1</id></user></users>")
+    broken = tmp_path / "nested" / "broken.xml"
+    broken.write_text("<users><user><id>1</name></user></users>")
+    (tmp_path / "notes.txt").write_text("<a>")
+
+    assert not cli_handler.verify_directory(str(tmp_path))
+    output = capsys.readouterr().out
+    assert f"VALID   {valid}" in output
+    assert f"INVALID {broken} (2 errors)" in output
+    assert "notes.txt" not in output
+    assert "1 of 2 files are invalid." in output
+
+    broken.unlink()
+    assert cli_handler.verify_directory(str(tmp_path), jobs=2)
+
+def test_verify_directory_rejects_file_options(tmp_path, monkeypatch):
+    for option in (["-f"], ["-o", "fixed.xml"], ["-c"]):
+        monkeypatch.setattr(sys, "argv", ["cli_handler.py", "verify", "-r", str(tmp_path)] + option)
+        with pytest.raises(SystemExit) as exit_info:
+            cli_handler.main()
+        assert exit_info.value.code == 2
+
+def test_verify_count_rejects_fix_options(tmp_path, monkeypatch):
+    path = tmp_path / "broken.xml"
+    path.write_text("<a><b></a>")
+    for option in (["-f"], ["-o", str(tmp_path / "fixed.xml")]):
+        monkeypatch.setattr(sys, "argv", ["cli_handler.py", "verify", "-i", str(path), "-c"] + option)
+        with pytest.raises(SystemExit) as exit_info:
+            cli_handler.main()
+        assert exit_info.value.code == 2
+    assert not (tmp_path / "fixed.xml").exists()
+
+def test_jobs_must_be_positive(tmp_path, monkeypatch):
+    path = tmp_path / "valid.xml"
+    path.write_text("<a></a>")
+    commands = (["verify", "-r", str(tmp_path), "-j", "0"], ["verify", "-i", str(path), "-j", "-1"],
+                ["format", "-i", str(path), "-j", "0"], ["compress", "-i", str(path), "-j", "0"],
+                ["decompress", "-i", str(path), "-j", "0"], ["verify", "-i", str(path), "-s", "-j", "2"])
+    for command in commands:
+        monkeypatch.setattr(sys, "argv", ["cli_handler.py"] + command)
+        with pytest.raises(SystemExit) as exit_info:
+            cli_handler.main()
+        assert exit_info.value.code == 2
@@ -0,0 +1,170 @@
+import zlib
+
+import pytest
+
+from src.modules import huffman, xml_blocks, xml_codecs, xml_containers, xml_dictionary
+from src.modules.bpe import learn_merges
+from src.modules.xml_compressor import XMLCompressor, BLOCKS, BPE, CONTAINERS
+from src.modules.xml_decompressor import XMLDecompressor
+from src.utils.xml_generator import SocialNetworkGenerator
+
+XML = '<users><user><id>1</id><name>Ahmed Ali</name><posts><post><body>Hi</body></post></posts></user></users>'
+
+
+def test_decompress_single_line(tmp_path):
+    compressed = tmp_path / "users.compressed.xml"
+    compressed.write_text('<users><user><id>1</><name>Ahmed Ali</></user></>', encoding="utf-8")
+    XMLDecompressor(str(compressed)).decompress(str(tmp_path / "out.xml"))
+    assert (tmp_path / "out.xml").read_text(encoding="utf-8") == (
+        '<users><user><id>1</id><name>Ahmed Ali</name></user></users>'
+    )
+
+def test_round_trip(tmp_path):
+    source = tmp_path / "users.xml"
+    source.write_text(XML, encoding="utf-8")
+    XMLCompressor(str(source)).compress(str(tmp_path / "users.compressed"))
+    XMLDecompressor(str(tmp_path / "users.compressed")).decompress(str(tmp_path / "users.out.xml"))
+    assert (tmp_path / "users.out.xml").read_text(encoding="utf-8") == XML
+
+def test_containers_round_trip(tmp_path):
+    source = tmp_path / "users.xml"
+    xml = ('<?xml version="1.0"?>\n<users>\n<!-- note -->\n' + XML + '\n<img src="a"/>\n'
+           '<user id="2"><name>Hé < x</name></stray></user>\n</users>\n')
+    source.write_text(xml, encoding="utf-8")
+    for use_mmap in (False, True):
+        compressed = tmp_path / "users.xmc"
+        XMLCompressor(str(source), use_mmap, method=CONTAINERS).compress(str(compressed))
+        assert xml_containers.is_container(compressed.read_bytes())
+        XMLDecompressor(str(compressed), use_mmap).decompress(str(tmp_path / "users.out.xml"))
+        assert (tmp_path / "users.out.xml").read_text(encoding="utf-8") == xml
+
+def test_containers_group_text_by_path():
+    xml = b"<users>" + b"".join(b"<user><id>%d</id><name>User %d</name></user>" % (k, k) for k in range(200)) + b"</users>"
+    compressed = xml_containers.encode(xml)
+    assert len(compressed) < len(zlib.compress(xml, 6))
+    assert b"".join(xml_containers.decode(compressed)) == xml
+
+def test_learn_merges():
+    # 'ab' is the most frequent pair, then the new symbol followed by 'c'
+    merges = learn_merges(b"abxabcyabczabcab", [200, 201, 202], min_count=2)
+    assert merges[:2] == [(202, ord("a"), ord("b")), (201, 202, ord("c"))]
+    assert learn_merges(b"aaaa", [200], min_count=2) == [(200, ord("a"), ord("a"))]
+
+def test_bpe_round_trip(tmp_path):
+    source = tmp_path / "users.xml"
+    xml = "<users>\r\n" + "<user><id>1</id><name>Hé</name></user>\n" * 50 + "</users>\n"
+    source.write_bytes(xml.encode("utf-8"))
+    compressed = tmp_path / "users.bpe"
+    XMLCompressor(str(source), method=BPE).compress(str(compressed))
+    assert compressed.stat().st_size < len(xml) // 4
+    XMLDecompressor(str(compressed)).decompress(str(tmp_path / "users.out.xml"))
+    assert (tmp_path / "users.out.xml").read_bytes() == xml.replace("\r\n", "\n").encode("utf-8")
+
+def test_huffman_codes():
+    lengths = huffman.code_lengths([0] * 97 + [8, 4, 2, 1, 1] + [0] * 154)
+    assert lengths[97:102] == [1, 2, 3, 4, 4]
+    assert huffman.canonical_codes(lengths) == {97: 0b0, 98: 0b10, 99: 0b110, 100: 0b1110, 101: 0b1111}
+    # Skewed counts are flattened until every code fits the limit
+    assert max(huffman.code_lengths([2 ** k for k in range(30)] + [0] * 226, limit=12)) <= 12
+
+def test_huffman_round_trip(tmp_path):
+    source = tmp_path / "users.xml"
+    source.write_text(XML * 20, encoding="utf-8")
+    for data in (b"", b"aaaa", bytes(range(256)) * 3):
+        assert b"".join(huffman.decode(b"".join(huffman.encode(data)))) == data
+    compressed = tmp_path / "users.huff"
+    XMLCompressor(str(source), huffman=True).compress(str(compressed))
+    assert compressed.stat().st_size < source.stat().st_size // 2
+    XMLDecompressor(str(compressed)).decompress(str(tmp_path / "users.out.xml"))
+    assert (tmp_path / "users.out.xml").read_text(encoding="utf-8") == XML * 20
+
+def test_decompress_small_chunks(tmp_path):
+    compressed = tmp_path / "users.compressed.xml"
+    compressed.write_bytes(b'<users>\r\n<user id="1"><id>1</><name>H\xc3\xa9</></>\r\n</>\r\n')
+    for chunk_size in (1, 2, 5, 1 << 20):
+        output = tmp_path / f"out_{chunk_size}.xml"
+        XMLDecompressor(str(compressed), chunk_size=chunk_size).decompress(str(output))
+        assert output.read_bytes() == b'<users>\n<user id="1"><id>1</id><name>H\xc3\xa9</name></user>\n</users>\n'
+
+def test_element_spans():
+    xml = b'<?xml version="1.0"?>\n<users><!-- <user> --><user><id>1</id></user>\n<user id="2"/><![CDATA[</users>]]></users>'
+    spans = xml_blocks.element_spans(xml)
+    assert [xml[start:end] for start, end in spans] == [b'<user><id>1</id></user>', b'<user id="2"/>']
+    assert xml_blocks.element_spans(b'<users><user></users>') is None
+
+def test_blocks_extract(tmp_path):
+    source = tmp_path / "users.xml"
+    users = [f"<user>\n<id>{k}</id>\n<name>User {k}</name>\n</user>" for k in range(1, 301)]
+    xml = '<?xml version="1.0"?>\n<users>\n' + "\n".join(users) + "\n</users>\n"
+    source.write_text(xml, encoding="utf-8")
+    compressed = tmp_path / "users.xbk"
+    XMLCompressor(str(source), method=BLOCKS).compress(str(compressed))
+    assert xml_blocks.is_block_file(compressed.read_bytes())
+    # Small blocks, so that extraction has to pick the right one
+    compressed.write_bytes(b"".join(xml_blocks.encode(xml.encode("utf-8"), block_size=512)))
+    decompressor = XMLDecompressor(str(compressed))
+    assert decompressor.extract(0) == [users[0]]
+    assert decompressor.extract(98, 103) == users[98:103]
+    assert decompressor.extract(299) == [users[299]]
+    for start, stop in ((-1, None), (300, None), (299, 301), (5, 5)):
+        with pytest.raises(IndexError):
+            decompressor.extract(start, stop)
+    assert decompressor.extract_by_id("250") == users[249]
+    assert decompressor.extract_by_id("301") is None
+    decompressor.decompress(str(tmp_path / "users.out.xml"))
+    assert (tmp_path / "users.out.xml").read_text(encoding="utf-8") == xml
+
+def test_blocks_workers(tmp_path):
+    source = tmp_path / "users.xml"
+    xml = "<users>\n" + "".join(f"<user><id>{k}</id></user>\n" for k in range(2000)) + "</users>\n"
+    source.write_text(xml, encoding="utf-8")
+    data = xml.encode("utf-8")
+    serial = b"".join(xml_blocks.encode(data, block_size=1024))
+    assert b"".join(xml_blocks.encode(data, block_size=1024, workers=2)) == serial
+    compressed = tmp_path / "users.xbk"
+    compressed.write_bytes(serial)
+    XMLDecompressor(str(compressed), workers=2).decompress(str(tmp_path / "users.out.xml"))
+    assert (tmp_path / "users.out.xml").read_text(encoding="utf-8") == xml
+
+def test_codec_chain_round_trip(tmp_path):
+    source = tmp_path / "users.xml"
+    source.write_text(XML * 20, encoding="utf-8")
+    for spec in ("zlib", "bz2", "tags+lzma", "containers+bz2"):
+        compressed = tmp_path / "users.xcc"
+        XMLCompressor(str(source), method=spec).compress(str(compressed))
+        assert xml_codecs.is_codec_file(compressed.read_bytes())
+        XMLDecompressor(str(compressed)).decompress(str(tmp_path / "users.out.xml"))
+        assert (tmp_path / "users.out.xml").read_text(encoding="utf-8") == XML * 20
+    with pytest.raises(ValueError):
+        XMLCompressor(str(source), method="tags+nothing")
+
+def test_register_custom_codec():
+    xml_codecs.register_codec("reverse", lambda data: bytes(data)[::-1], lambda data: bytes(data)[::-1])
+    data = XML.encode("utf-8")
+    assert xml_codecs.decode(xml_codecs.encode(data, "reverse+zlib")) == data
+    rows = xml_codecs.benchmark(data, ["reverse", "tags+zlib"])
+    assert [row[0] for row in rows] == ["reverse", "tags+zlib"]
+    assert all(row[-1] for row in rows)
+
+def test_trained_dictionary(tmp_path):
+    samples = []
+    for seed in (1, 2):
+        samples.append(tmp_path / f"sample_{seed}.xml")
+        SocialNetworkGenerator(seed=seed).generate(str(samples[-1]), 200)
+    source = tmp_path / "users.xml"
+    SocialNetworkGenerator(seed=3).generate(str(source), 200)
+    dictionary = tmp_path / "social.xdc"
+    XMLCompressor.train_dictionary([str(sample) for sample in samples], str(dictionary), size=8192)
+    assert len(xml_dictionary.load(str(dictionary))) == 8192
+
+    plain, primed = tmp_path / "plain.xbk", tmp_path / "primed.xbk"
+    XMLCompressor(str(source), method=BLOCKS, block_size=2048).compress(str(plain))
+    XMLCompressor(str(source), method=BLOCKS, block_size=2048, dictionary=str(dictionary)).compress(str(primed))
+    assert primed.stat().st_size < plain.stat().st_size * 0.8
+
+    decompressor = XMLDecompressor(str(primed), dictionary=str(dictionary))
+    decompressor.decompress(str(tmp_path / "users.out.xml"))
+    assert (tmp_path / "users.out.xml").read_bytes() == source.read_bytes().replace(b"\r\n", b"\n")
+    assert "<id>7</id>" in decompressor.extract_by_id("7")
+    with pytest.raises(ValueError):
+        XMLDecompressor(str(primed)).extract(0)
@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import pytest
+
+from src.utils.file_utils import map_file, read_text, normalize_newlines, normalize_chunks
+from src.modules.xml_parser import XMLParser
+from src.modules.xml_minifier import XMLMinifier
+from src.modules.xml_compressor import XMLCompressor
+from src.modules.xml_decompressor import XMLDecompressor
+from src.graph.graph_representation import GraphRepresentation
+from src.postsearch.post_search import PostSearch
+
+SAMPLE = str(Path(__file__).parent.parent / "samples" / "post_search_sample.xml")
+
+
+@pytest.fixture
+def crlf_sample(tmp_path):
+    path = tmp_path / "crlf.xml"
+    with open(SAMPLE, "rb") as file:
+        path.write_bytes(file.read().replace(b"\n", b"\r\n"))
+    return str(path)
+
+def test_read_text(tmp_path, crlf_sample):
+    assert read_text(crlf_sample, use_mmap=True) == read_text(crlf_sample)
+    empty = tmp_path / "empty.xml"
+    empty.write_bytes(b"")
+    assert read_text(str(empty), use_mmap=True) == ""
+    with map_file(str(empty)) as data:
+        assert data == b""
+
+def test_normalize_newlines():
+    data = b"<a>\n</a>"
+    assert normalize_newlines(data) is data
+    assert normalize_newlines(b"<a>\r\n\r</a>") == b"<a>\n\n</a>"
+
+def test_normalize_chunks():
+    data = b"a\r\nb\rc\r\r\nd\r"
+    for size in (1, 2, 3, len(data)):
+        chunks = [data[k:k + size] for k in range(0, len(data), size)]
+        assert b"".join(normalize_chunks(chunks)) == normalize_newlines(data)
+
+def test_mmap_matches_read(tmp_path, crlf_sample):
+    for path in (SAMPLE, crlf_sample):
+        parsers = [XMLParser(path, use_mmap=use_mmap) for use_mmap in (False, True)]
+        assert parsers[0].check_consistency() == parsers[1].check_consistency()
+
+        outputs = []
+        for use_mmap in (False, True):
+            minified = tmp_path / f"minified_{use_mmap}.xml"
+            compressed = tmp_path / f"compressed_{use_mmap}.xml"
+            decompressed = tmp_path / f"decompressed_{use_mmap}.xml"
+            XMLMinifier(path, use_mmap).minify(str(minified))
+            XMLCompressor(path, use_mmap).compress(str(compressed))
+            XMLDecompressor(str(compressed), use_mmap).decompress(str(decompressed))
+            outputs.append([file.read_bytes() for file in (minified, compressed, decompressed)])
+        assert outputs[0] == outputs[1]
+
+        graphs = [GraphRepresentation.build_graph(path, use_mmap) for use_mmap in (False, True)]
+        assert graphs[0].adjacency_list == graphs[1].adjacency_list
+        assert repr(graphs[0].users) == repr(graphs[1].users)
+
+        searches = [PostSearch(path, use_mmap) for use_mmap in (False, True)]
+        assert searches[0].search_word("lorem") == searches[1].search_word("lorem")
+        assert searches[0].search_topic("economy") == searches[1].search_topic("economy")
+        searches[1].close()
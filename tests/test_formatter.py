@@ -0,0 +1,51 @@
+from src.modules.xml_formatter import XMLFormatter
+
+XML = '<?xml version="1.0"?>\n<users>\n<user><id>1</id><!-- note -->\n<name>Ahmed\n Ali</name><img src="a"/></user>\n</users>\n'
+EXPECTED = (
+    '<?xml version="1.0"?>\n'
+    '<users>\n'
+    '  <user>\n'
+    '    <id>\n'
+    '      1\n'
+    '    </id>\n'
+    '    <name>\n'
+    '      Ahmed Ali\n'
+    '    </name>\n'
+    '    <img src="a"/>\n'
+    '  </user>\n'
+    '</users>'
+)
+
+
+def test_prettify(tmp_path):
+    source = tmp_path / "users.xml"
+    source.write_text(XML, encoding="utf-8")
+    XMLFormatter(str(source)).prettify(str(tmp_path / "out.xml"), 2)
+    assert (tmp_path / "out.xml").read_text(encoding="utf-8") == EXPECTED
+
+def test_prettify_small_chunks(tmp_path):
+    source = tmp_path / "users.xml"
+    source.write_text(XML, encoding="utf-8")
+    for chunk_size in (1, 2, 5, 13):
+        output = tmp_path / f"out_{chunk_size}.xml"
+        XMLFormatter(str(source), chunk_size=chunk_size).prettify(str(output), 2)
+        assert output.read_text(encoding="utf-8") == EXPECTED
+
+def test_prettify_missing_file(tmp_path):
+    missing = str(tmp_path / "missing.xml")
+    assert XMLFormatter(missing).prettify(str(tmp_path / "out.xml")) == f"{missing} is not Found"
+
+def test_prettify_workers(tmp_path):
+    source = tmp_path / "users.xml"
+    source.write_text("<users>\n" + "<user><id>1</id><name>A</name></user>\n" * 50 + "</users>\n", encoding="utf-8")
+    XMLFormatter(str(source)).prettify(str(tmp_path / "serial.xml"))
+    XMLFormatter(str(source), workers=3).prettify(str(tmp_path / "parallel.xml"))
+    assert (tmp_path / "parallel.xml").read_bytes() == (tmp_path / "serial.xml").read_bytes()
+
+def test_prettify_bytes(tmp_path):
+    source = tmp_path / "users.xml"
+    source.write_bytes(XML.replace("Ahmed", "Ahmé").replace("\n", "\r\n").encode("utf-8"))
+    for chunk_size in (1, 5, 1 << 20):
+        output = tmp_path / f"out_{chunk_size}.xml"
+        XMLFormatter(str(source), chunk_size=chunk_size, binary=True).prettify(str(output), 2)
+        assert output.read_text(encoding="utf-8") == EXPECTED.replace("Ahmed", "Ahmé")
@@ -0,0 +1,37 @@
+from src.utils.xml_generator import SocialNetworkGenerator, parse_size
+from src.utils.benchmark import run_benchmarks
+from src.modules.xml_parser import XMLParser
+from src.graph.graph_representation import GraphRepresentation
+from src.postsearch.post_search import PostSearch
+
+
+def test_parse_size():
+    assert parse_size("1MB") == 1 << 20
+    assert parse_size("1.5kb") == 1536
+    assert parse_size("2GB") == 2 << 30
+    assert parse_size("100") == 100
+
+def test_generate_deterministic(tmp_path):
+    first, second = tmp_path / "a.xml", tmp_path / "b.xml"
+    written = SocialNetworkGenerator(seed=7).generate(str(first), 50)
+    SocialNetworkGenerator(seed=7).generate(str(second), 50)
+    assert first.read_bytes() == second.read_bytes()
+    assert written == first.stat().st_size
+
+def test_generated_network_is_consistent(tmp_path):
+    path = str(tmp_path / "social.xml")
+    users = SocialNetworkGenerator().generate_size(path, "64KB")
+    assert abs((tmp_path / "social.xml").stat().st_size - (64 << 10)) < (64 << 10) * 0.1
+    assert XMLParser(path).check_consistency() == 0
+
+    graph = GraphRepresentation.build_graph(path)
+    assert len(graph.users) == users
+    for user_id, followers in graph.adjacency_list.items():
+        assert user_id not in followers
+        assert all(graph.has_node(follower) for follower in followers)
+    assert PostSearch(path).search_topic("economy")
+
+def test_run_benchmarks(tmp_path):
+    results = run_benchmarks(["16KB"], ["verify", "decompress"], str(tmp_path), memory=True, report=lambda line: None)
+    assert [result["operation"] for result in results] == ["verify", "decompress"]
+    assert all(result["seconds"] > 0 and result["peak_mb"] > 0 for result in results)
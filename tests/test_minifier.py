@@ -0,0 +1,34 @@
+from src.modules.xml_minifier import XMLMinifier
+
+
+def test_remove_comments():
+    minifier = XMLMinifier("unused.xml")
+    assert minifier.remove_comments("<a><!-- x --><b/><!-- <!-- y -->z</a>") == "<a><b/>z</a>"
+    assert minifier.remove_comments("<a>--></a><!-- open") == "<a>--></a>"
+
+def test_clean_whitespace():
+    minifier = XMLMinifier("unused.xml")
+    xml = '<users>\n    <user id="1">\n        <name>  Ahmed Ali  </name>\n    </user>\n</users>\n'
+    assert minifier.clean_whitespace(xml) == '<users><user id="1"><name>Ahmed Ali</name></user></users>'
+
+def test_minify(tmp_path):
+    path = tmp_path / "commented.xml"
+    path.write_text("<a>\n  <!-- note -->\n  <b> text </b>\n</a>\n", encoding="utf-8")
+    XMLMinifier(str(path)).minify(str(tmp_path / "out.xml"))
+    assert (tmp_path / "out.xml").read_text(encoding="utf-8") == "<a><b>text</b></a>"
+
+def test_minify_chunks_matches_two_passes():
+    minifier = XMLMinifier("unused.xml")
+    xml = ('<?xml version="1.0"?>\n<users> <!-- a <!-- b --> \n  <user id="1">\n    <name> A > B </name>'
+           '<!-- c --> x <!-- d\n -->y\n  </user><img <!-- e -->src="a"/>\n</users> <!-- open')
+    expected = minifier.clean_whitespace(minifier.remove_comments(xml))
+    for chunk_size in (1, 2, 3, 5, 17, len(xml)):
+        chunks = (xml[k:k + chunk_size] for k in range(0, len(xml), chunk_size))
+        assert "".join(minifier.minify_chunks(chunks)) == expected
+
+def test_minify_bytes(tmp_path):
+    path = tmp_path / "commented.xml"
+    path.write_text("<a>\n  <!-- note -->\n  <b> héllo\n wörld </b>\n</a>\n", encoding="utf-8")
+    for chunk_size in (1, 3, 1 << 20):
+        XMLMinifier(str(path), chunk_size=chunk_size, binary=True).minify(str(tmp_path / "out.xml"))
+        assert (tmp_path / "out.xml").read_text(encoding="utf-8") == "<a><b>héllo\n wörld</b></a>"
@@ -1,6 +1,14 @@
+import io
+from pathlib import Path
+
+from src.modules.xml_parser import XMLParser, MISSING_OPENING, MISSING_CLOSING
+from src.modules.xml_tokenizer import XMLTokenizer, OPEN_TAG, CLOSE_TAG
+
+SAMPLES = Path(__file__).parent.parent / "samples"
+
 # Test the XMLParser class
 def test_extract_tag():
-    parser = XMLParser("../samples/commented_sample.xml")
+    parser = XMLParser(str(SAMPLES / "commented_sample.xml"))
     assert parser.extract_tag("<tag>", 0) == "tag"
     assert parser.extract_tag("<tag attribute='value'>", 0) == "tag"
     assert parser.extract_tag("<tag attribute='value'>", 5) == "attribute='value'"
@@ -8,27 +16,127 @@ def test_extract_tag():
     assert parser.extract_tag("</tag attribute='value'>", 0) == "/tag"
     
 def test_check_consistency():
-    parser = XMLParser("../samples/sample.xml")
+    parser = XMLParser(str(SAMPLES / "sample.xml"))
     assert parser.check_consistency() == 15
-    parser = XMLParser("../samples/commented_sample.xml")
-    assert parser.check_consistency() == 6
+    # Well formed apart from its comment, which check_consistency skips
+    parser = XMLParser(str(SAMPLES / "commented_sample.xml"))
+    assert parser.check_consistency() == 0
 
-def test_fix_errors():
-    parser = XMLParser("../samples/sample.xml")
+def test_fix_errors(tmp_path):
+    parser = XMLParser(str(SAMPLES / "sample.xml"))
     parser.check_consistency()
-    parser.fix_errors()
-    parser = XMLParser("../samples/sample_fixed.xml")
+    parser.fix_errors(str(tmp_path / "sample_fixed.xml"))
+    parser = XMLParser(str(tmp_path / "sample_fixed.xml"))
     assert parser.check_consistency() == 0
     
-    parser = XMLParser("../samples/commented_sample.xml")
+    # Nothing to fix in these, so no file is written
+    for name in ("commented_sample", "large_sample"):
+        parser = XMLParser(str(SAMPLES / f"{name}.xml"))
+        assert parser.check_consistency() == 0
+        parser.fix_errors(str(tmp_path / f"{name}_fixed.xml"))
+        assert not (tmp_path / f"{name}_fixed.xml").exists()
+
+def test_tokenize():
+    tokens = list(XMLTokenizer().tokenize('<?xml version="1.0"?>\n<a x="1"><!-- c -->\n  <b>t</b></a>'))
+    assert tokens == [
+        (OPEN_TAG, "a", 1, 0),
+        (OPEN_TAG, "b", 2, 2),
+        (CLOSE_TAG, "b", 2, 6),
+        (CLOSE_TAG, "a", 2, 10),
+    ]
+
+def test_check_consistency_single_line(tmp_path):
+    path = tmp_path / "single_line.xml"
+    path.write_text("<users><user><id>1</name></user></users>")
+    parser = XMLParser(str(path))
+    assert parser.check_consistency() == 2
+    assert parser.errors == [
+        (0, 18, "Missing closing tag for id"),
+        (0, 18, "Missing opening tag for name"),
+    ]
+    assert parser.fixes == [(0, 17, "</id>"), (0, 17, "<name>")]
+
+def test_check_consistency_stream(tmp_path):
+    path = tmp_path / "split.xml"
+    path.write_text("<users>\n  <user><id>1</name>\n  </user>\n</users>\n<posts>")
+    parser = XMLParser(str(path))
     parser.check_consistency()
-    parser.fix_errors()
-    parser = XMLParser("../samples/commented_sample_fixed.xml")
-    assert parser.check_consistency() == 0
-    
-    parser = XMLParser("../samples/large_sample.xml")
+    for chunk_size in (1, 3, 7, 64):
+        streamed = XMLParser(str(path), stream=True, chunk_size=chunk_size)
+        streamed.check_consistency()
+        assert streamed.errors == parser.errors
+        assert streamed.fixes == parser.fixes
+
+def test_check_consistency_workers(tmp_path):
+    path = tmp_path / "sharded.xml"
+    path.write_text("<users><user><id>1</name></user>\n" * 200 + "</posts><users>")
+    parser = XMLParser(str(path))
     parser.check_consistency()
-    parser.fix_errors()
-    parser = XMLParser("../samples/large_sample_fixed.xml")
-    assert parser.check_consistency() == 0
+    sharded = XMLParser(str(path), workers=4)
+    sharded.check_consistency()
+    assert sharded.errors == parser.errors
+    assert sharded.fixes == parser.fixes
+
+def test_fix_errors_output(tmp_path):
+    path = tmp_path / "broken.xml"
+    path.write_text("<users><user><id>1</name></user>")
+    parser = XMLParser(str(path), chunk_size=4)
+    parser.check_consistency()
+    output = io.StringIO()
+    parser.fix_errors(output)
+    assert output.getvalue() == (
+        "<users><user><id>1"
+        "(Missing closing tag for id) </id>(Missing opening tag for name) <name>"
+        "</name></user>(Missing closing tag for users) </users>\n"
+    )
+
+    output_path = tmp_path / "repaired.xml"
+    parser.fix_errors(str(output_path))
+    assert output_path.read_text() == output.getvalue()
+
+def test_max_errors_and_counts(tmp_path):
+    path = tmp_path / "many_errors.xml"
+    path.write_text("</a>" * 1000 + "<b>")
+    parser = XMLParser(str(path), stream=True, chunk_size=16)
+    assert parser.check_consistency(max_errors=3) == 3
+    assert parser.errors == [
+        (0, 0, "Missing opening tag for a"),
+        (0, 4, "Missing opening tag for a"),
+        (0, 8, "Missing opening tag for a"),
+    ]
+    assert next(parser.iter_errors()) == ((0, 0, "Missing opening tag for a"), (0, -1, "<a>"))
+    assert parser.count_errors() == {(MISSING_OPENING, "a"): 1000, (MISSING_CLOSING, "b"): 1}
 
+def test_recheck_after_edit(tmp_path):
+    path = tmp_path / "edited.xml"
+    text = "<users>\n" + "  <user><id>1</id></user>\n" * 50 + "</users>\n<extra>"
+    path.write_text(text)
+    parser = XMLParser(str(path), checkpoint_interval=64)
+    parser.check_consistency()
+
+    # Break one user in the middle of the file, then repair it again
+    start = text.index("<id>", len(text) // 2)
+    broken = text[:start] + "<name>" + text[start:]
+    path.write_text(broken)
+    assert parser.recheck(start, start, start + len("<name>")) == 6
+    expected = XMLParser(str(path))
+    expected.check_consistency()
+    assert parser.errors == expected.errors
+    assert parser.fixes == expected.fixes
+
+    path.write_text(text)
+    assert parser.recheck(start, start + len("<name>"), start) == 1
+    assert parser.errors == [(-1, -1, "Missing closing tag for extra")]
+
+def test_modes_decode_utf8(tmp_path):
+    path = tmp_path / "names.xml"
+    path.write_bytes("<users>\n  <user><name>Aḥmed Ālī</name><id>1</nom>\n  </user>\n</users>\n<é>".encode("utf-8"))
+    parser = XMLParser(str(path))
+    parser.check_consistency()
+    for options in ({"stream": True, "chunk_size": 5}, {"workers": 2}):
+        other = XMLParser(str(path), **options)
+        other.check_consistency()
+        assert other.errors == parser.errors
+        assert other.fixes == parser.fixes
+    parser.fix_errors(str(tmp_path / "fixed.xml"))
+    assert "<name>Aḥmed Ālī</name><id>1(Missing closing tag for id) </id>" in (tmp_path / "fixed.xml").read_text(encoding="utf-8")
@@ -0,0 +1,22 @@
+from src.modules.structural_index import StructuralIndex
+from src.modules.xml_tokenizer import XMLTokenizer
+
+
+def test_positions():
+    index = StructuralIndex(b'<a x="1">\n<b/></a>')
+    assert index.positions('<').tolist() == [0, 10, 14]
+    assert index.positions('"').tolist() == [5, 7]
+    assert index.next_positions('>', [0, 10, 16]).tolist() == [8, 13, 17]
+    assert index.lines([0, 10, 14]).tolist() == [0, 1, 1]
+
+def test_columns_count_characters():
+    index = StructuralIndex('<é>ü</é>\n  <a>'.encode('utf-8'))
+    offsets = index.positions('<')
+    assert index.columns(offsets).tolist() == [0, 4, 2]
+
+def test_tag_spans_match_tokenizer():
+    text = '<?xml version="1.0"?>\n<a><!-- c --><b\n>t</b><</a>'
+    index = StructuralIndex(text.encode('utf-8'))
+    starts, ends, nested = index.tag_spans()
+    assert starts.tolist() == [22, 35, 40, 44, 45]
+    assert list(XMLTokenizer().tokenize_index(index)) == list(XMLTokenizer().tokenize(text))
@@ -0,0 +1,83 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from src.modules.xml_to_json import XMLToJSONConverter, XMLCustomParser
+
+SAMPLES = Path(__file__).parent.parent / "samples"
+
+XML = ('<?xml version="1.0"?>\n<users>\n<!-- note -->\n'
+       '<user id="1"><name>Ahmed Ali</name><posts><post>Hi</post><post>Bye</post></posts></user>\n</users>\n')
+
+
+def test_convert(tmp_path):
+    source = tmp_path / "users.xml"
+    source.write_text(XML, encoding="utf-8")
+    XMLToJSONConverter(str(source)).convert(str(tmp_path / "users.json"))
+    assert json.loads((tmp_path / "users.json").read_text(encoding="utf-8")) == {
+        "users": {"user": {"id": "1", "name": "Ahmed Ali", "posts": {"post": ["Hi", "Bye"]}}}
+    }
+
+def test_build_tree_from_generator():
+    converter = XMLToJSONConverter("unused.xml")
+    root = converter._build_tree(iter(XMLCustomParser.tokenize(XML)))
+    assert root.tag == "users" and root.children[0].attributes == {"id": "1"}
+
+def test_build_tree_errors():
+    converter = XMLToJSONConverter("unused.xml")
+    with pytest.raises(ValueError, match="Mismatched closing tag"):
+        converter._build_tree(["<users>", "<user>", "</users>"])
+    assert converter._debug_info["current_context"] == ["users", "user"]
+    assert converter._debug_info["token_index"] == 2
+    with pytest.raises(ValueError, match="Empty XML content"):
+        converter._build_tree([])
+
+def test_tokenize():
+    text = '<a>abc <!-- x <b> --> def<?xml version="1.0"?>g<c x="1"/> h\n</a>'
+    tokens = XMLCustomParser.tokenize(text)
+    assert iter(tokens) is tokens
+    assert list(tokens) == ['<a>', 'abc  defg', '<c x="1"/>', 'h', '</a>']
+
+def test_tokenize_chunks():
+    text = XML + '<a>abc<!-- x <b> -->def<!--<!-- y-->g<c x="1"/>h<?pi?>i</a>'
+    for size in (1, 2, 3, 7, 64):
+        chunks = (text[i:i + size] for i in range(0, len(text), size))
+        assert list(XMLCustomParser.tokenize_chunks(chunks)) == list(XMLCustomParser.tokenize(text))
+
+def test_tokenize_chunks_single_line():
+    # Minified export: one line, starting with a declaration
+    text = ('<?xml version="1.0"?><users>'
+            + "".join(f"<user><id>{k}</id><!-- c --></user>" for k in range(2000)) + "</users>")
+    fed = 0
+    def chunks():
+        nonlocal fed
+        for i in range(0, len(text), 16):
+            fed = i + 16
+            yield text[i:i + 16]
+
+    tokens = []
+    end = 0
+    for token in XMLCustomParser.tokenize_chunks(chunks()):
+        end = text.index(token, end) + len(token)
+        # Only a few tokens' worth of text is held back
+        assert fed - end < 64
+        tokens.append(token)
+    assert tokens == list(XMLCustomParser.tokenize(text))
+
+@pytest.mark.parametrize("name", ["large_sample.xml", "commented_sample.xml"])
+def test_convert_stream(tmp_path, name):
+    path = str(SAMPLES / name)
+    XMLToJSONConverter(path).convert(str(tmp_path / "tree.json"))
+    for chunk_size in (7, 1 << 20):
+        XMLToJSONConverter(path, stream=True, chunk_size=chunk_size).convert(str(tmp_path / "stream.json"))
+        assert (tmp_path / "stream.json").read_text(encoding="utf-8") == (tmp_path / "tree.json").read_text(encoding="utf-8")
+
+def test_convert_stream_errors(tmp_path):
+    source = tmp_path / "users.xml"
+    source.write_text("<users><user>1</user><admin/><user>2</user></users>", encoding="utf-8")
+    with pytest.raises(ValueError, match="not next to each other"):
+        XMLToJSONConverter(str(source), stream=True).convert(str(tmp_path / "users.json"))
+    source.write_text("<users><user></users>", encoding="utf-8")
+    with pytest.raises(ValueError, match="Mismatched closing tag"):
+        XMLToJSONConverter(str(source), stream=True).convert(str(tmp_path / "users.json"))